@@ -9,6 +9,14 @@ from flask_wtf.csrf import CSRFProtect
 from functools import wraps
 from models import db, User, Transaction, Budget, Payroll
 from config import config
+from event_hub import hub
+from last_seen import last_seen
+from audit_sink import audit_sink
+from query_profiler import query_profiler
+from metrics import metrics
+from db_pool import configure_pool
+from user_cache import init_user_cache, load_cached_user
+from money import MoneyJSONProvider, format_money
 
 # Initialize extensions
 login_manager = LoginManager()
@@ -19,16 +27,12 @@ limiter = Limiter(key_func=get_remote_address)
 def create_app(config_name='development'):
     # Create the application instance
     app = Flask(__name__)
+    app.json = MoneyJSONProvider(app)
+    app.add_template_filter(format_money, 'money')
 
     # Load config
     app.config.from_object(config[config_name])
 
-    # Configure SQLAlchemy pool settings
-    app.config['SQLALCHEMY_POOL_SIZE'] = 20
-    app.config['SQLALCHEMY_MAX_OVERFLOW'] = 5
-    app.config['SQLALCHEMY_POOL_TIMEOUT'] = 30
-    app.config['SQLALCHEMY_POOL_RECYCLE'] = 1800  # Recycle connections after 30 minutes
-
     # Override database URL if environment variable exists
     db_url = os.environ.get('DATABASE_URL')
     if not db_url:
@@ -42,6 +46,9 @@ def create_app(config_name='development'):
         )
     app.config['SQLALCHEMY_DATABASE_URI'] = db_url
 
+    # The only place pool settings are applied; sized from WAITRESS_THREADS
+    configure_pool(app)
+
     # Force development settings for HTTP
     if config_name == 'development':
         app.config.update(
@@ -53,12 +60,19 @@ def create_app(config_name='development'):
             REMEMBER_COOKIE_HTTPONLY=True
         )
 
-    # Initialize extensions with app
+    # Initialize extensions with app; metrics first so its timer wraps the other hooks
+    metrics.init_app(app)
     db.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
     csrf.init_app(app)
     limiter.init_app(app)
+    limiter.exempt(metrics.view)
+    hub.init_app(app)
+    last_seen.init_app(app)
+    audit_sink.init_app(app)
+    query_profiler.init_app(app)
+    init_user_cache(app)
 
     # Configure login manager
     login_manager.login_view = 'auth.login'
@@ -69,7 +83,7 @@ def create_app(config_name='development'):
     def load_user(user_id):
         """Load user by ID."""
         try:
-            return User.query.get(int(user_id))
+            return load_cached_user(int(user_id))
         except Exception as e:
             app.logger.error(f"Error loading user {user_id}: {str(e)}")
             return None
@@ -78,12 +92,8 @@ def create_app(config_name='development'):
     def before_request():
         """Log user activity and update last seen."""
         if current_user.is_authenticated:
-            current_user.last_seen = datetime.utcnow()
-            try:
-                db.session.commit()
-            except Exception as e:
-                app.logger.error(f"Failed to update user last seen: {str(e)}")
-                db.session.rollback()
+            # Buffered; written in batches by the last-seen flush thread
+            last_seen.touch(current_user.id, current_user.last_seen)
 
     # Role-based access control decorators
     def admin_required(f):
@@ -129,6 +139,10 @@ def create_app(config_name='development'):
     app.register_blueprint(auth_bp)
     app.register_blueprint(main_bp)
 
+    # Register CLI commands
+    from commands import register_commands
+    register_commands(app)
+
     # Create database and admin user
     with app.app_context():
         try:
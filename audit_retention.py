@@ -0,0 +1,121 @@
+import gzip
+import json
+import os
+import re
+from models import db, AuditLog
+from finance_aggregates import month_start, add_months
+
+# audit_logs-<year>-<month>-<first id>-<last id>.jsonl.gz
+ARCHIVE_NAME = re.compile(r'^audit_logs-(\d{4})-(\d{2})-(\d+)-(\d+)\.jsonl\.gz$')
+
+
+def archive_cutoff(retention_months, now=None):
+    """First day of the oldest month kept in the hot audit_logs table."""
+    return add_months(month_start(now), -retention_months)
+
+
+def _month_filter(table, start, end):
+    return db.and_(table.c.timestamp >= start, table.c.timestamp < end)
+
+
+def oldest_entry_query(cutoff):
+    """MIN(timestamp) of the audit logs older than cutoff."""
+    return db.session.query(db.func.min(AuditLog.timestamp)).filter(AuditLog.timestamp < cutoff)
+
+
+def archived_through(archive_dir, start):
+    """Highest audit log id already written to an archive file for a month."""
+    last_id = None
+    for name in os.listdir(archive_dir):
+        match = ARCHIVE_NAME.match(name)
+        if match and (int(match.group(1)), int(match.group(2))) == (start.year, start.month):
+            last_id = max(last_id or 0, int(match.group(4)))
+    return last_id
+
+
+def _delete_through(start, end, last_id, batch_size):
+    """Delete a month's rows up to last_id in batches, committing each one."""
+    table = AuditLog.__table__
+    deleted = 0
+    while True:
+        ids = [row.id for row in db.session.execute(
+            db.select(table.c.id)
+            .where(_month_filter(table, start, end), table.c.id <= last_id)
+            .order_by(table.c.id)
+            .limit(batch_size)
+        )]
+        if not ids:
+            return deleted
+        db.session.execute(table.delete().where(table.c.id.in_(ids)))
+        db.session.commit()
+        deleted += len(ids)
+
+
+def _write_month(archive_dir, start, end, batch_size):
+    """Stream one month of rows into a gzip JSON lines file; returns (path, rows, last id)."""
+    table = AuditLog.__table__
+    partial = os.path.join(archive_dir, f'audit_logs-{start:%Y-%m}.partial')
+    result = db.session.execute(
+        table.select()
+        .where(_month_filter(table, start, end))
+        .order_by(table.c.id)
+        .execution_options(stream_results=True)
+    )
+    first_id = last_id = None
+    rows = 0
+    with gzip.open(partial, 'wt', encoding='utf-8') as f:
+        for chunk in result.partitions(batch_size):
+            for row in chunk:
+                entry = dict(row._mapping)
+                entry['timestamp'] = entry['timestamp'].isoformat()
+                f.write(json.dumps(entry) + '\n')
+            first_id = chunk[0].id if first_id is None else first_id
+            last_id = chunk[-1].id
+            rows += len(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+    db.session.commit()
+
+    if not rows:
+        os.remove(partial)
+        return None, 0, None
+    path = os.path.join(archive_dir, f'audit_logs-{start:%Y-%m}-{first_id}-{last_id}.jsonl.gz')
+    os.replace(partial, path)
+    return path, rows, last_id
+
+
+def archive_audit_logs(archive_dir, retention_months, now=None, batch_size=5000):
+    """Move whole months of audit_logs older than the retention window into archive files.
+
+    Each month is written to a gzip JSON lines file before any of its rows
+    are deleted, and the file name records the id range it holds. A run that
+    was interrupted after writing a file first deletes the rows that file
+    already covers, so re-running never archives a row twice. Returns a
+    list of (path, rows) for the files written.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    cutoff = archive_cutoff(retention_months, now)
+    oldest = oldest_entry_query(cutoff).scalar()
+    if oldest is None:
+        return []
+
+    archived = []
+    start = month_start(oldest)
+    while start < cutoff:
+        end = add_months(start, 1)
+        done = archived_through(archive_dir, start)
+        if done is not None:
+            _delete_through(start, end, done, batch_size)
+        path, rows, last_id = _write_month(archive_dir, start, end, batch_size)
+        if path is not None:
+            _delete_through(start, end, last_id, batch_size)
+            archived.append((path, rows))
+        start = end
+    return archived
+
+
+def read_archive(path):
+    """Yield the audit log entries stored in an archive file as dicts."""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
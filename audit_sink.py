@@ -0,0 +1,303 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import Session
+from models import db, AuditLog
+
+AUDIT_COLUMNS = ('user_id', 'action', 'resource_type', 'resource_id', 'details', 'ip_address', 'timestamp')
+REQUIRED_COLUMNS = ('user_id', 'action', 'resource_type')
+
+# Errors caused by the rows themselves; anything else means the database is unavailable
+ROW_ERRORS = (IntegrityError, DataError)
+
+# Rows the database rejected, kept in spill_dir for inspection
+DEAD_LETTER_FILE = 'dead-letter.jsonl'
+
+# session.info key for entries waiting on the request's commit
+PENDING_KEY = 'audit_sink.pending'
+
+
+class AuditSink:
+    """Write-behind sink for audit_logs.
+
+    Handlers enqueue entries instead of adding them to the request session.
+    Every entry is first appended to a journal segment in spill_dir, then to
+    a bounded in-memory buffer. A background thread rotates the segment every
+    flush_interval seconds, bulk-inserts its rows with executemany and then
+    deletes the segment file. When the buffer is full the entry is kept only
+    in the journal and the flush reads the rows back from the file, so
+    request handlers never block on the database.
+
+    Segments left behind by a crash or a failed insert are replayed on the
+    next flush, once they are older than stale_after seconds. Delivery is at
+    least once: a crash between the insert commit and the file delete
+    replays that segment again. If the database rejects a batch (integrity
+    or data error), its rows are retried one at a time and the ones that
+    still fail go to the dead-letter file, so one bad row cannot hold up the
+    rest.
+    """
+
+    def __init__(self, maxsize=10000, batch_size=500, flush_interval=1.0, stale_after=300):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stale_after = stale_after
+        self.spill_dir = None
+        self.fsync = False
+        self.written_rows = 0
+        self.spilled_rows = 0
+        self.app = None
+        self._buffer = []
+        self._overflow = False
+        self._journal = None
+        self._segment = 0
+        self._owner = None
+        self._owner_pid = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+        self.maxsize = app.config.get('AUDIT_QUEUE_SIZE', self.maxsize)
+        self.batch_size = app.config.get('AUDIT_BATCH_SIZE', self.batch_size)
+        self.flush_interval = app.config.get('AUDIT_FLUSH_SECONDS', self.flush_interval)
+        self.stale_after = app.config.get('AUDIT_SPILL_STALE_SECONDS', self.stale_after)
+        self.fsync = app.config.get('AUDIT_SPILL_FSYNC', self.fsync)
+        self.spill_dir = app.config.get('AUDIT_SPILL_DIR') or os.path.join(app.root_path, 'logs', 'audit-spill')
+        os.makedirs(self.spill_dir, exist_ok=True)
+
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_soft_rollback', self._after_rollback)
+        app.extensions['audit_sink'] = self
+        atexit.register(self.stop)
+
+    @property
+    def queue_depth(self):
+        return len(self._buffer)
+
+    def enqueue(self, entry):
+        """Queue an AuditLog (or a dict of its columns) for the next flush."""
+        row = self._checked_row(entry)
+        if row is not None:
+            self._put(row)
+
+    def enqueue_on_commit(self, entry):
+        """Queue entry once the current db.session transaction commits.
+
+        Use this for entries that describe a change made in the same
+        transaction; the entry is dropped if the transaction rolls back.
+        """
+        row = self._checked_row(entry)
+        if row is not None:
+            db.session().info.setdefault(PENDING_KEY, []).append(row)
+
+    def _after_commit(self, session):
+        for row in session.info.pop(PENDING_KEY, ()):
+            self._put(row)
+
+    def _after_rollback(self, session, previous_transaction):
+        session.info.pop(PENDING_KEY, None)
+
+    @staticmethod
+    def _row(entry):
+        if isinstance(entry, AuditLog):
+            row = {column: getattr(entry, column) for column in AUDIT_COLUMNS}
+        else:
+            row = {column: entry.get(column) for column in AUDIT_COLUMNS}
+        missing = [column for column in REQUIRED_COLUMNS if row[column] is None]
+        if missing:
+            raise ValueError(f"Audit entry is missing {', '.join(missing)}")
+        row['timestamp'] = row['timestamp'] or datetime.utcnow()
+        return row
+
+    def _checked_row(self, entry):
+        # An entry the table cannot hold is dropped here, not when its batch is flushed
+        try:
+            return self._row(entry)
+        except ValueError as e:
+            self.app.logger.warning(f"Dropping audit entry: {str(e)}")
+            return None
+
+    def _put(self, row):
+        line = json.dumps(dict(row, timestamp=row['timestamp'].isoformat())) + '\n'
+        with self._lock:
+            if self._journal is None:
+                self._segment += 1
+                self._journal = open(self._segment_path(self._segment), 'a', encoding='utf-8')
+            self._journal.write(line)
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+            if len(self._buffer) < self.maxsize:
+                self._buffer.append(row)
+            else:
+                self._overflow = True
+                self.spilled_rows += 1
+        self._ensure_thread()
+
+    @property
+    def owner(self):
+        # Segment names carry a per-process token rather than the pid, which
+        # a restarted container or a forked worker may reuse
+        if self._owner_pid != os.getpid():
+            self._owner, self._owner_pid = uuid.uuid4().hex, os.getpid()
+        return self._owner
+
+    def _segment_path(self, seq):
+        return os.path.join(self.spill_dir, f'audit-{self.owner}-{seq:06d}.jsonl')
+
+    def flush(self):
+        """Write queued entries and any leftover segments; returns rows written."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+                overflow, self._overflow = self._overflow, False
+                current = self._journal.name if self._journal is not None else None
+                last_closed = self._segment
+                if self._journal is not None:
+                    self._journal.close()
+                    self._journal = None
+
+            written = 0
+            for path in self._pending_segments(last_closed):
+                if path == current and not overflow:
+                    segment_rows = rows
+                else:
+                    segment_rows = self._read_segment(path)
+                    if segment_rows is None:
+                        continue
+                segment_written = self._write_segment(path, segment_rows)
+                if segment_written is None:
+                    break
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    self.app.logger.error(f"Failed to remove audit spill file {path}: {str(e)}")
+                written += segment_written
+            return written
+
+    def _pending_segments(self, last_closed):
+        """Closed segments of this process, plus stale ones claimed from others.
+
+        Only own segments up to last_closed are taken; a newer one may still
+        be open for writing.
+        """
+        owner = self.owner
+        own, claimed = [], []
+        for path in sorted(glob.glob(os.path.join(self.spill_dir, 'audit-*-*.jsonl'))):
+            try:
+                segment_owner, seq = os.path.basename(path)[6:-6].split('-')
+                seq = int(seq)
+            except ValueError:
+                continue
+            if segment_owner == owner:
+                if seq <= last_closed:
+                    own.append(path)
+                continue
+            try:
+                if time.time() - os.path.getmtime(path) < self.stale_after:
+                    continue
+                # Renaming claims the segment, so two processes never replay the same file
+                with self._lock:
+                    self._segment += 1
+                    target = self._segment_path(self._segment)
+                os.rename(path, target)
+            except OSError:
+                continue
+            claimed.append(target)
+        return own + claimed
+
+    def _read_segment(self, path):
+        rows = []
+        try:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        # A crash can leave a partial last line
+                        self.app.logger.warning(f"Skipping unreadable audit entry in {path}")
+                        continue
+                    row['timestamp'] = datetime.fromisoformat(row['timestamp'])
+                    rows.append(row)
+        except FileNotFoundError:
+            return None
+        return rows
+
+    def _write_segment(self, path, rows):
+        """Insert a segment's rows; returns rows written, or None to keep the segment."""
+        try:
+            self._insert(rows)
+            return len(rows)
+        except ROW_ERRORS as e:
+            self.app.logger.warning(f"Audit batch from {path} rejected, retrying rows one at a time: {str(e)}")
+        except Exception as e:
+            self.app.logger.error(f"Failed to write audit logs, keeping spill file: {str(e)}")
+            return None
+
+        written, rejected = 0, []
+        for row in rows:
+            try:
+                self._insert([row])
+                written += 1
+            except ROW_ERRORS as e:
+                rejected.append((row, e))
+            except Exception as e:
+                # Rows already written here are written again when the segment is replayed
+                self.app.logger.error(f"Failed to write audit logs, keeping spill file: {str(e)}")
+                return None
+        self._dead_letter(rejected)
+        return written
+
+    def _dead_letter(self, rejected):
+        path = os.path.join(self.spill_dir, DEAD_LETTER_FILE)
+        with open(path, 'a', encoding='utf-8') as f:
+            for row, error in rejected:
+                self.app.logger.error(f"Audit entry rejected by the database, moved to {path}: {row} ({str(error)})")
+                f.write(json.dumps(dict(row, timestamp=row['timestamp'].isoformat(), error=str(error))) + '\n')
+
+    def _insert(self, rows):
+        if not rows:
+            return
+        stmt = AuditLog.__table__.insert()
+        with self.app.app_context():
+            try:
+                for start in range(0, len(rows), self.batch_size):
+                    db.session.execute(stmt, rows[start:start + self.batch_size])
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            finally:
+                db.session.remove()
+        self.written_rows += len(rows)
+
+    def _ensure_thread(self):
+        if self._thread is not None or self.app is None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='audit-sink', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def stop(self):
+        """Stop the flush thread and write whatever is still queued."""
+        self._stop.set()
+        if self.app is not None:
+            self.flush()
+
+
+audit_sink = AuditSink()
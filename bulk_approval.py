@@ -0,0 +1,122 @@
+import json
+from datetime import datetime
+from models import db, Transaction
+from money import to_cents
+from ledger_rollup import apply_deltas
+from notification_store import refresh_budget_notifications
+from ledger_version import bump_ledger_version
+from audit_sink import audit_sink
+
+BULK_ACTIONS = {'approve': 'approved', 'reject': 'rejected'}
+BULK_APPROVAL_MAX = 1000
+
+# Columns needed to check, update and re-bucket a transaction
+REVIEW_COLUMNS = (
+    Transaction.id, Transaction.department_id, Transaction.status, Transaction.date,
+    Transaction.category, Transaction.type, Transaction.amount
+)
+
+
+def candidates_query(ids=None, filters=None, department_ids=None, limit=BULK_APPROVAL_MAX):
+    """The locking SELECT behind pending_candidates."""
+    query = db.session.query(*REVIEW_COLUMNS)
+    if ids is not None:
+        query = query.filter(Transaction.id.in_(ids))
+    else:
+        filters = filters or {}
+        query = query.filter(Transaction.status == 'pending')
+        if department_ids is not None:
+            query = query.filter(Transaction.department_id.in_(department_ids))
+        if filters.get('department_id'):
+            query = query.filter(Transaction.department_id == filters['department_id'])
+        if filters.get('category'):
+            query = query.filter(Transaction.category == filters['category'])
+        if filters.get('type'):
+            query = query.filter(Transaction.type == filters['type'])
+        if filters.get('start_date'):
+            query = query.filter(Transaction.date >= filters['start_date'])
+        if filters.get('end_date'):
+            query = query.filter(Transaction.date <= filters['end_date'])
+        query = query.order_by(Transaction.id).limit(limit)
+    return query.with_for_update()
+
+
+def pending_candidates(ids=None, filters=None, department_ids=None, limit=BULK_APPROVAL_MAX):
+    """Rows to review: the given ids, or pending transactions matching filters.
+
+    filters may hold department_id, category, type, start_date and end_date
+    (datetimes). In filter mode department_ids (None for all) restricts the
+    rows before the limit, so other departments' rows are neither counted
+    nor locked. Rows are locked FOR UPDATE until the caller commits.
+    """
+    return candidates_query(ids, filters, department_ids, limit).all()
+
+
+def bulk_review(user, action, ids=None, filters=None, source_ip=None):
+    """Approve or reject many transactions with one UPDATE; returns (outcomes, updated rows).
+
+    outcomes maps each id to 'approved'/'rejected', 'not_found', 'forbidden'
+    or 'not_pending'. can_manage_department is checked once per department.
+    The status change, rollup deltas and a single audit record are added to
+    the session; the caller commits.
+    """
+    status = BULK_ACTIONS[action]
+    department_ids = None
+    if ids is None:
+        department_ids = user.managed_department_ids()
+        if department_ids == []:
+            return {}, []
+    rows = pending_candidates(ids, filters, department_ids)
+    outcomes = {id: 'not_found' for id in ids} if ids is not None else {}
+
+    allowed = {}
+    eligible = []
+    for row in rows:
+        if row.department_id not in allowed:
+            allowed[row.department_id] = user.can_manage_department(row.department_id)
+        if not allowed[row.department_id]:
+            outcomes[row.id] = 'forbidden'
+        elif (row.status or 'pending') != 'pending':
+            outcomes[row.id] = 'not_pending'
+        else:
+            outcomes[row.id] = status
+            eligible.append(row)
+
+    if not eligible:
+        return outcomes, []
+
+    Transaction.query.filter(
+        Transaction.id.in_([row.id for row in eligible])
+    ).update({
+        'status': status,
+        'approver_id': user.id,
+        'approval_date': datetime.utcnow()
+    }, synchronize_session=False)
+
+    # Move each transaction from its pending rollup bucket to the new status
+    deltas = {}
+    for row in eligible:
+        if row.date is None:
+            continue
+        cents = to_cents(row.amount)
+        bucket = (row.date.date(), int(row.department_id), row.category, row.type)
+        for key, sign in ((bucket + ('pending',), -1), (bucket + (status,), 1)):
+            delta = deltas.setdefault(key, [0, 0])
+            delta[0] += cents * sign
+            delta[1] += sign
+    apply_deltas(deltas)
+    refresh_budget_notifications()
+    bump_ledger_version()
+
+    audit_sink.enqueue_on_commit({
+        'user_id': user.id,
+        'action': f'TRANSACTIONS_BULK_{status.upper()}',
+        'resource_type': 'transaction',
+        'ip_address': source_ip,
+        'details': json.dumps({
+            'count': len(eligible),
+            'transaction_ids': [row.id for row in eligible],
+            'total': float(sum(row.amount for row in eligible))
+        })
+    })
+    return outcomes, eligible
@@ -0,0 +1,154 @@
+import os
+import click
+from models import db
+
+
+def register_commands(app):
+    """Register maintenance commands on the Flask CLI."""
+
+    @app.cli.command('rebuild-ledger-rollup')
+    def rebuild_ledger_rollup():
+        """Rebuild the daily_ledger_rollup table from transactions."""
+        from ledger_rollup import rebuild_rollup
+        try:
+            rows = rebuild_rollup()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        click.echo(f'Rebuilt daily ledger rollup: {rows} rows')
+
+    @app.cli.command('refresh-notifications')
+    def refresh_notifications():
+        """Generate any budget notifications that are due."""
+        from notification_store import refresh_budget_notifications
+        try:
+            created = refresh_budget_notifications()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        click.echo(f'Created {created} notifications')
+
+    @app.cli.command('archive-audit-logs')
+    @click.option('--retention-months', type=int, default=None,
+                  help='Months to keep in the database (default AUDIT_RETENTION_MONTHS).')
+    def archive_audit_logs(retention_months):
+        """Move audit logs older than the retention window into gzip archive files."""
+        from audit_retention import archive_audit_logs
+        if retention_months is None:
+            retention_months = app.config['AUDIT_RETENTION_MONTHS']
+        archive_dir = app.config.get('AUDIT_ARCHIVE_DIR') or os.path.join(app.root_path, 'logs', 'audit-archive')
+        try:
+            archived = archive_audit_logs(archive_dir, retention_months)
+        except Exception:
+            db.session.rollback()
+            raise
+        for path, rows in archived:
+            click.echo(f'Archived {rows} audit logs to {path}')
+        click.echo(f'Archived {sum(rows for _, rows in archived)} audit logs')
+
+    @app.cli.command('import-transactions')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--user-id', type=int, required=True, help='User recorded as the creator.')
+    @click.option('--category', default=None, help='Category for rows that do not give one.')
+    @click.option('--department-id', type=int, default=None, help='Department for rows that do not give one.')
+    @click.option('--format', 'import_format', type=click.Choice(['csv', 'ofx']), default=None,
+                  help='File format (default: from the file extension).')
+    @click.option('--dry-run', is_flag=True, help='Validate only; write nothing.')
+    def import_transactions_command(path, user_id, category, department_id, import_format, dry_run):
+        """Bulk import transactions from a CSV or OFX file."""
+        from transaction_import import read_csv, read_ofx, import_transactions
+        import_format = import_format or path.rsplit('.', 1)[-1].lower()
+        if import_format not in ('csv', 'ofx'):
+            raise click.UsageError('Cannot tell the file format; pass --format')
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            rows = read_csv(f) if import_format == 'csv' else read_ofx(f)
+            try:
+                result = import_transactions(
+                    rows,
+                    creator_id=user_id,
+                    defaults={'category': category, 'department_id': department_id},
+                    source=os.path.basename(path),
+                    batch_size=app.config.get('IMPORT_BATCH_SIZE', 1000),
+                    dry_run=dry_run
+                )
+            except Exception:
+                db.session.rollback()
+                raise
+        for row, message in result.errors:
+            click.echo(f'row {row}: {message}')
+        verb = 'Validated' if dry_run else 'Imported'
+        click.echo(f'{verb} {result.inserted} transactions, {len(result.errors)} rows rejected')
+        if result.failure is not None:
+            row, message = result.failure
+            stopped = f'Import stopped at row {row}' if row is not None else 'Import stopped before the first row'
+            if result.committed_through is None:
+                raise click.ClickException(f'{stopped}: {message}. Nothing was committed.')
+            raise click.ClickException(
+                f'{stopped}: {message}. '
+                f'Rows through {result.committed_through} are committed; resume after that row.'
+            )
+
+    @app.cli.command('check-query-plans')
+    @click.option('--seed', is_flag=True,
+                  help='Fill an empty scratch database with sample ledger data first.')
+    def check_query_plans(seed):
+        """EXPLAIN each route's main query and fail on any full table scan."""
+        from query_plans import route_queries, full_scans, seed_plan_fixture
+        if seed:
+            try:
+                seed_plan_fixture()
+            except RuntimeError as e:
+                raise click.ClickException(str(e))
+        failures = 0
+        for name, query in route_queries():
+            tables = full_scans(name, query)
+            if tables:
+                failures += 1
+                click.echo(f'FULL SCAN  {name}: {", ".join(tables)}')
+            else:
+                click.echo(f'ok         {name}')
+        if failures:
+            raise click.ClickException(f'{failures} queries scan a whole table')
+
+    @app.cli.command('check-serializers')
+    @click.option('--rows', type=int, default=200, show_default=True,
+                  help='Rows of each model to serialize.')
+    @click.option('--seed', is_flag=True,
+                  help='Fill an empty scratch database with sample ledger data first.')
+    def check_serializers(rows, seed):
+        """Serialize each API model with lazy loads disabled and fail on any lazy load."""
+        from sqlalchemy.exc import InvalidRequestError
+        from models import Transaction, Payroll, AuditLog
+        from serializers import serialize
+        from query_plans import seed_plan_fixture
+        if seed:
+            try:
+                seed_plan_fixture()
+            except RuntimeError as e:
+                raise click.ClickException(str(e))
+
+        raiseload = app.config.get('SERIALIZER_RAISELOAD')
+        app.config['SERIALIZER_RAISELOAD'] = True
+        failures = 0
+        try:
+            for model in (Transaction, Payroll, AuditLog):
+                # Rows already in the session would keep their lazy loaders
+                db.session.expunge_all()
+                name = model.__name__
+                try:
+                    count = len(serialize(model.query.order_by(model.id).limit(rows)))
+                except InvalidRequestError as e:
+                    failures += 1
+                    click.echo(f'LAZY LOAD  {name}: {e}')
+                    continue
+                if not count:
+                    failures += 1
+                    click.echo(f'NO ROWS    {name}')
+                else:
+                    click.echo(f'ok         {name}: {count} rows')
+        finally:
+            app.config['SERIALIZER_RAISELOAD'] = raiseload
+        if failures:
+            raise click.ClickException(f'{failures} models could not be checked with raiseload on')
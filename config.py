@@ -26,11 +26,17 @@ class Config:
     # SQLAlchemy settings
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = os.environ.get('SQLALCHEMY_ECHO', 'True').lower() == 'true'
-    SQLALCHEMY_ENGINE_OPTIONS = {
-        'pool_size': 10,
-        'pool_recycle': 3600,
-        'pool_pre_ping': True  # Enable automatic reconnection
-    }
+
+    # Connection pool, one per worker process. The engine options are built
+    # from these by db_pool.configure_pool; DB_POOL_SIZE defaults to
+    # WAITRESS_THREADS plus the background writers.
+    WAITRESS_THREADS = int(os.environ.get('WAITRESS_THREADS', '4'))
+    WORKER_PROCESSES = int(os.environ.get('WORKER_PROCESSES', '1'))
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '0')) or None
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', '2'))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', '10'))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', '1800'))
+    DB_MAX_CONNECTIONS = int(os.environ.get('DB_MAX_CONNECTIONS', '0')) or None
     
     # Session settings with stronger defaults
     try:
@@ -59,6 +65,57 @@ class Config:
     RATELIMIT_STORAGE_URL = os.environ.get('REDIS_URL', 'memory://')
     RATELIMIT_HEADERS_ENABLED = True
     
+    # Dashboard event stream settings. Every open stream holds a Waitress
+    # thread, so by default at most half of the threads may serve streams.
+    SSE_HEARTBEAT_SECONDS = int(os.environ.get('SSE_HEARTBEAT_SECONDS', '15'))
+    SSE_MAX_STREAM_SECONDS = int(os.environ.get('SSE_MAX_STREAM_SECONDS', '300'))
+    SSE_QUEUE_SIZE = int(os.environ.get('SSE_QUEUE_SIZE', '100'))
+    SSE_MAX_CONNECTIONS = int(os.environ.get(
+        'SSE_MAX_CONNECTIONS',
+        str(max(1, WAITRESS_THREADS // 2))
+    ))
+    
+    # users.last_seen is buffered in memory and written in batches
+    LAST_SEEN_FLUSH_SECONDS = int(os.environ.get('LAST_SEEN_FLUSH_SECONDS', '30'))
+    LAST_SEEN_THRESHOLD_SECONDS = int(os.environ.get('LAST_SEEN_THRESHOLD_SECONDS', '60'))
+    
+    # Audit logs are journaled to AUDIT_SPILL_DIR and bulk-inserted in the background
+    AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE', '10000'))
+    AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', '500'))
+    AUDIT_FLUSH_SECONDS = float(os.environ.get('AUDIT_FLUSH_SECONDS', '1'))
+    AUDIT_SPILL_DIR = os.environ.get('AUDIT_SPILL_DIR')
+    AUDIT_SPILL_STALE_SECONDS = int(os.environ.get('AUDIT_SPILL_STALE_SECONDS', '300'))
+    AUDIT_SPILL_FSYNC = os.environ.get('AUDIT_SPILL_FSYNC', 'False').lower() == 'true'
+    
+    # Months of audit logs kept in the database; older months go to gzip files
+    AUDIT_RETENTION_MONTHS = int(os.environ.get('AUDIT_RETENTION_MONTHS', '12'))
+    AUDIT_ARCHIVE_DIR = os.environ.get('AUDIT_ARCHIVE_DIR')
+    
+    # Per-request SQL statement counts and timings, aggregated per endpoint.
+    # X-DB-* response headers default to on in debug only.
+    QUERY_PROFILER_ENABLED = os.environ.get('QUERY_PROFILER_ENABLED', 'True').lower() == 'true'
+    QUERY_PROFILER_REPEAT_THRESHOLD = int(os.environ.get('QUERY_PROFILER_REPEAT_THRESHOLD', '5'))
+    
+    # Bearer token for scraping /metrics; admins can always view it
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    
+    # Raise instead of lazy loading when serializers.py output reads an undeclared relationship;
+    # `flask check-serializers` runs every serialized model this way
+    SERIALIZER_RAISELOAD = os.environ.get('SERIALIZER_RAISELOAD', 'False').lower() == 'true'
+    
+    # Rows per insert batch (and per commit) for bulk transaction imports
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', '1000'))
+    
+    # Flask-Login user loader cache (per process). A role change, deactivation
+    # or deletion in one worker reaches the others within USER_CACHE_VERSION_SECONDS,
+    # when they re-read the shared user version and drop their cached users
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', '1024'))
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', '60'))
+    USER_CACHE_VERSION_SECONDS = int(os.environ.get('USER_CACHE_VERSION_SECONDS', '5'))
+    
+    # Budget periods: first calendar month of the fiscal year (1 = January)
+    FISCAL_YEAR_START_MONTH = int(os.environ.get('FISCAL_YEAR_START_MONTH', '1'))
+    
     # Mail settings
     MAIL_SERVER = os.environ.get('MAIL_SERVER')
     MAIL_PORT = int(os.environ.get('MAIL_PORT', '587'))
@@ -98,6 +155,7 @@ class TestingConfig(Config):
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
     SESSION_COOKIE_SECURE = False
+    SERIALIZER_RAISELOAD = True
 
 class ProductionConfig(Config):
     DEBUG = False
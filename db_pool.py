@@ -0,0 +1,103 @@
+import threading
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import Pool
+from models import db
+
+# Background threads that also check out connections: audit sink and last_seen flush
+BACKGROUND_CONNECTIONS = 2
+
+
+class PoolEvents:
+    """Counters for connection churn, fed by pool events."""
+
+    def __init__(self):
+        self.connects = 0
+        self.invalidations = 0
+        self.disconnects = 0
+        self._lock = threading.Lock()
+
+    def increment(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+
+pool_events = PoolEvents()
+
+
+def pool_settings(config):
+    """Per-process pool size, overflow, timeout and recycle derived from the app config.
+
+    Every Waitress thread can hold one connection, plus one for each
+    background writer. DB_POOL_SIZE overrides the derived size. With
+    DB_MAX_CONNECTIONS set, size plus overflow is capped so that all
+    WORKER_PROCESSES together stay within the server's connection limit.
+    """
+    threads = config.get('WAITRESS_THREADS', 4)
+    workers = max(config.get('WORKER_PROCESSES', 1), 1)
+    size = config.get('DB_POOL_SIZE') or threads + BACKGROUND_CONNECTIONS
+    overflow = config.get('DB_MAX_OVERFLOW', 2)
+
+    max_connections = config.get('DB_MAX_CONNECTIONS')
+    if max_connections:
+        per_worker = max(max_connections // workers, 1)
+        size = min(size, per_worker)
+        overflow = max(min(overflow, per_worker - size), 0)
+
+    return {
+        'pool_size': size,
+        'max_overflow': overflow,
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 10),
+        # Close connections before MySQL's wait_timeout or an idle proxy drops them
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': False
+    }
+
+
+def configure_pool(app):
+    """Set SQLALCHEMY_ENGINE_OPTIONS from pool_settings before the engine is created.
+
+    Liveness comes from pool_recycle instead of a pre-ping round trip on
+    every checkout. A statement that fails with a disconnect error makes
+    SQLAlchemy invalidate that connection and every connection opened
+    before it, so one failed request flushes a stale pool.
+    """
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI')
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if uri and make_url(uri).get_backend_name() != 'sqlite':
+        options.update(pool_settings(app.config))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+    if not event.contains(Pool, 'connect', _on_connect):
+        event.listen(Pool, 'connect', _on_connect)
+        event.listen(Pool, 'invalidate', _on_invalidate)
+
+
+def _on_connect(dbapi_connection, connection_record):
+    pool_events.increment('connects')
+
+
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    pool_events.increment('invalidations')
+    if exception is not None:
+        pool_events.increment('disconnects')
+
+
+def pool_stats():
+    """Current pool occupancy and churn counters for this process."""
+    pool = db.engine.pool
+    stats = {
+        'connects': pool_events.connects,
+        'invalidations': pool_events.invalidations,
+        'disconnects': pool_events.disconnects
+    }
+    if hasattr(pool, 'checkedout'):
+        stats.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'overflow': max(pool.overflow(), 0),
+            'checked_in': pool.checkedin(),
+            'max_overflow': pool._max_overflow,
+            'timeout': pool.timeout()
+        })
+    return stats
@@ -0,0 +1,136 @@
+import json
+import queue
+import threading
+import time
+
+from money import json_default
+
+# Roles that receive events for every department
+ALL_DEPARTMENT_ROLES = ('admin', 'finance', 'accountant')
+
+
+class Subscription:
+    """One connected stream: a bounded event queue plus the subscriber's filters."""
+
+    def __init__(self, user_id, role, department_id, queue_size):
+        self.user_id = user_id
+        self.role = role
+        self.department_id = department_id
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def accepts(self, department_id=None, roles=None):
+        if roles is not None and self.role not in roles:
+            return False
+        if department_id is None or self.role in ALL_DEPARTMENT_ROLES:
+            return True
+        return self.department_id == department_id
+
+
+class EventHub:
+    """In-process publish/subscribe hub feeding the dashboard event streams.
+
+    Each subscriber gets a bounded queue. A subscriber that falls behind
+    is marked as overflowed and its stream ends, so the client reconnects
+    and a slow connection cannot hold a server thread indefinitely.
+    """
+
+    def __init__(self, queue_size=100, max_connections=50):
+        self.queue_size = queue_size
+        self.max_connections = max_connections
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.queue_size = app.config.get('SSE_QUEUE_SIZE', self.queue_size)
+        self.max_connections = app.config.get('SSE_MAX_CONNECTIONS', self.max_connections)
+        app.extensions['event_hub'] = self
+
+    @property
+    def connection_count(self):
+        return len(self._subscriptions)
+
+    def subscribe(self, user_id, role, department_id):
+        """Register a subscriber, or return None when the connection limit is reached."""
+        with self._lock:
+            if len(self._subscriptions) >= self.max_connections:
+                return None
+            subscription = Subscription(user_id, role, department_id, self.queue_size)
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event, data=None, department_id=None, roles=None):
+        """Fan an event out to every matching subscriber without blocking.
+
+        department_id limits delivery to that department (plus roles that see
+        all departments); roles limits delivery to subscribers with one of
+        those roles.
+        """
+        message = {'event': event, 'data': data or {}, 'timestamp': time.time()}
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if not subscription.accepts(department_id, roles):
+                continue
+            try:
+                subscription.queue.put_nowait(message)
+            except queue.Full:
+                subscription.overflowed = True
+
+    def listen(self, subscription, heartbeat=15, max_duration=300):
+        """Yield batches of pending events, or None when a heartbeat is due.
+
+        Stops after max_duration seconds or once the subscriber overflows.
+        """
+        deadline = time.monotonic() + max_duration
+        while not subscription.overflowed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                batch = [subscription.queue.get(timeout=min(heartbeat, remaining))]
+            except queue.Empty:
+                yield None
+                continue
+            # Coalesce whatever else arrived so one update covers the burst
+            while True:
+                try:
+                    batch.append(subscription.queue.get_nowait())
+                except queue.Empty:
+                    break
+            yield batch
+
+
+def format_sse(data, event=None):
+    """Encode a payload as a Server-Sent Events message."""
+    lines = []
+    if event:
+        lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, default=json_default)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+hub = EventHub()
+
+
+def transaction_event_data(transaction):
+    """Payload describing a transaction on the dashboard stream."""
+    department_id = int(transaction.department_id) if transaction.department_id is not None else None
+    return {
+        'id': transaction.id,
+        'type': transaction.type,
+        'amount': transaction.amount,
+        'category': transaction.category,
+        'status': transaction.status,
+        'department_id': department_id
+    }
+
+
+def publish_transaction(event, transaction):
+    """Publish a transaction change to the subscribers of its department."""
+    data = transaction_event_data(transaction)
+    hub.publish(event, data, department_id=data['department_id'])
@@ -0,0 +1,99 @@
+import csv
+import io
+import tempfile
+from flask import Response, stream_with_context
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # XLSX export is optional
+    Workbook = None
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+EXPORT_BATCH_SIZE = 1000
+
+# Columns of each export as (header, attribute)
+TRANSACTION_EXPORT_COLUMNS = (
+    ('ID', 'id'), ('Date', 'date'), ('Type', 'type'), ('Category', 'category'),
+    ('Description', 'description'), ('Amount', 'amount'), ('Status', 'status'),
+    ('Department ID', 'department_id'), ('Creator ID', 'creator_id'),
+    ('Approver ID', 'approver_id'), ('Approval Date', 'approval_date')
+)
+BUDGET_EXPORT_COLUMNS = (('Category', 'category'), ('Budget Amount', 'budget_amount'))
+PAYROLL_EXPORT_COLUMNS = (
+    ('ID', 'id'), ('Employee ID', 'employee_id'), ('Salary Amount', 'salary_amount'),
+    ('Payment Date', 'payment_date'), ('Status', 'status'), ('Notes', 'notes'),
+    ('Created At', 'created_at')
+)
+AUDIT_LOG_EXPORT_COLUMNS = (
+    ('ID', 'id'), ('Timestamp', 'timestamp'), ('User ID', 'user_id'), ('Action', 'action'),
+    ('Resource Type', 'resource_type'), ('Resource ID', 'resource_id'),
+    ('IP Address', 'ip_address'), ('Details', 'details')
+)
+
+# Spreadsheet apps evaluate cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def available_formats():
+    return EXPORT_FORMATS if Workbook is not None else ('csv',)
+
+
+def _cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_query(query, batch_size=EXPORT_BATCH_SIZE):
+    """Iterate a query through a server-side cursor, batch_size rows at a time."""
+    return query.execution_options(stream_results=True).yield_per(batch_size)
+
+
+def csv_chunks(columns, rows, batch_size=EXPORT_BATCH_SIZE):
+    """Yield CSV text for rows, one chunk per batch_size rows, header first."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header for header, _ in columns)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(_cell(getattr(row, attribute)) for _, attribute in columns)
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def xlsx_chunks(columns, rows, title):
+    """Build an XLSX file in write-only mode and yield it in blocks.
+
+    Rows are written to a temporary file as they arrive, so memory stays
+    flat, but the zip container can only be sent once it is complete.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    sheet.append([header for header, _ in columns])
+    for row in rows:
+        sheet.append([_cell(getattr(row, attribute)) for _, attribute in columns])
+    with tempfile.TemporaryFile() as f:
+        workbook.save(f)
+        f.seek(0)
+        while True:
+            block = f.read(64 * 1024)
+            if not block:
+                return
+            yield block
+
+
+def export_response(name, columns, rows, export_format='csv'):
+    """Stream rows as a CSV or XLSX download named <name>.<format>."""
+    if export_format == 'xlsx':
+        body = xlsx_chunks(columns, rows, name)
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    else:
+        body = csv_chunks(columns, rows)
+        mimetype = 'text/csv'
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{name}.{export_format}"'}
+    )
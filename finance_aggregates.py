@@ -0,0 +1,300 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from models import db, Budget, DailyLedgerRollup, Payroll
+from money import from_cents
+
+TRANSACTION_TYPES = ('income', 'expense')
+GRANULARITIES = ('day', 'week', 'month')
+BUDGET_PERIODS = ('month', 'quarter', 'fiscal_year')
+PAYROLL_HISTORY_MONTHS = (6, 12, 24)
+
+# Budget alert levels as (fraction of budget spent, alert type), highest first
+FINANCIAL_ALERT_THRESHOLDS = ((1.0, 'warning'), (0.8, 'info'))
+REAL_TIME_ALERT_THRESHOLDS = ((1.0, 'danger'), (0.9, 'warning'))
+NOTIFICATION_THRESHOLDS = ((0.8, 'warning'), (0.5, 'info'))
+
+
+def month_start(value=None):
+    """Return midnight on the first day of the month containing value."""
+    value = value or datetime.utcnow()
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(value, months):
+    """Shift a first-of-month datetime by a number of calendar months."""
+    index = value.year * 12 + (value.month - 1) + months
+    return value.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def period_bounds(period, now=None, fiscal_year_start_month=1):
+    """Return the [start, end) datetimes of the month, quarter or fiscal year containing now.
+
+    Quarters are calendar quarters; the fiscal year starts on the first of
+    fiscal_year_start_month.
+    """
+    if period not in BUDGET_PERIODS:
+        raise ValueError(f'Unsupported budget period: {period}')
+
+    current = month_start(now)
+    if period == 'month':
+        return current, add_months(current, 1)
+    if period == 'quarter':
+        start = add_months(current, -((current.month - 1) % 3))
+        return start, add_months(start, 3)
+    start = add_months(current, -((current.month - fiscal_year_start_month) % 12))
+    return start, add_months(start, 12)
+
+
+def percent_change(current, previous):
+    """Percentage change from previous to current, 0 when there is no baseline."""
+    if previous > 0:
+        return float((current - previous) / previous * 100)
+    return 0.0
+
+
+def _day_bounds(start, end=None):
+    """Translate a datetime window into rollup dates [first, last).
+
+    The rollup is kept per calendar day, so a window that starts or ends
+    part-way through a day covers that whole day.
+    """
+    first = start.date()
+    if end is None:
+        return first, None
+    last = end.date()
+    if end != datetime(last.year, last.month, last.day):
+        last += timedelta(days=1)
+    return first, last
+
+
+def _cents_sum():
+    # MySQL returns SUM over BIGINT as DECIMAL; callers fold the rows as int cents
+    return db.func.sum(DailyLedgerRollup.total_cents)
+
+
+def _rollup_query(columns, start, end=None, department_id=None, status=None):
+    first, last = _day_bounds(start, end)
+    query = db.session.query(*columns).filter(DailyLedgerRollup.date >= first)
+    if last is not None:
+        query = query.filter(DailyLedgerRollup.date < last)
+    if department_id is not None:
+        query = query.filter(DailyLedgerRollup.department_id == department_id)
+    if status is not None:
+        query = query.filter(DailyLedgerRollup.status == status)
+    return query
+
+
+def type_totals_query(start, end=None, department_id=None, status=None):
+    """SUM ... GROUP BY type over the daily ledger rollup for [start, end)."""
+    return _rollup_query(
+        (DailyLedgerRollup.type, _cents_sum()),
+        start, end, department_id, status
+    ).group_by(DailyLedgerRollup.type)
+
+
+def type_totals(start, end=None, department_id=None, status=None):
+    """Sum transaction amounts per type for the window [start, end).
+
+    Runs a single grouped query (type_totals_query) and returns a dict of
+    Decimal amounts with an entry for every transaction type, defaulting
+    to 0.
+    """
+    totals = dict.fromkeys(TRANSACTION_TYPES, 0)
+    for transaction_type, cents in type_totals_query(start, end, department_id, status):
+        totals[transaction_type] = int(cents or 0)
+    return {transaction_type: from_cents(cents) for transaction_type, cents in totals.items()}
+
+
+def category_totals(start, end=None, transaction_type='expense', department_id=None, status=None):
+    """Sum transaction amounts per category for the window [start, end)."""
+    query = _rollup_query(
+        (DailyLedgerRollup.category, _cents_sum()),
+        start, end, department_id, status
+    ).filter(DailyLedgerRollup.type == transaction_type)
+
+    return {category: from_cents(cents or 0) for category, cents in query.group_by(DailyLedgerRollup.category)}
+
+
+def period_summary(start, end, prev_start, prev_end=None, department_id=None, status=None):
+    """Income/expense totals for a window and their change against a previous window.
+
+    The previous window defaults to ending where the current one starts.
+    Issues one grouped query per window.
+    """
+    current = type_totals(start, end, department_id=department_id, status=status)
+    previous = type_totals(prev_start, prev_end or start, department_id=department_id, status=status)
+
+    income = current['income']
+    expenses = current['expense']
+    income_change = percent_change(income, previous['income'])
+    expense_change = percent_change(expenses, previous['expense'])
+    return {
+        'income': income,
+        'expenses': expenses,
+        'net': income - expenses,
+        'previous_income': previous['income'],
+        'previous_expenses': previous['expense'],
+        'income_change': income_change,
+        'expense_change': expense_change,
+        'net_change': income_change - expense_change
+    }
+
+
+def time_series(start, end, granularity='day', department_id=None, status=None):
+    """Income and expense series for [start, end] bucketed by day, week or month.
+
+    Runs one query over the daily ledger rollup grouped by date and type,
+    then folds the rows as integer cents into preallocated bucket arrays in
+    a single pass.
+    Weeks are counted in seven-day steps from start.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f'Unsupported granularity: {granularity}')
+
+    first_day = start.date()
+    last_day = end.date()
+    if granularity == 'month':
+        first_month = first_day.year * 12 + first_day.month - 1
+        size = last_day.year * 12 + last_day.month - 1 - first_month + 1
+        labels = [f'{(first_month + i) // 12:04d}-{(first_month + i) % 12 + 1:02d}' for i in range(size)]
+    else:
+        step = 7 if granularity == 'week' else 1
+        size = (last_day - first_day).days // step + 1
+        labels = [(first_day + timedelta(days=i * step)).strftime('%Y-%m-%d') for i in range(size)]
+
+    series = {transaction_type: [0] * size for transaction_type in TRANSACTION_TYPES}
+
+    query = _rollup_query(
+        (DailyLedgerRollup.date, DailyLedgerRollup.type, _cents_sum()),
+        start, end, department_id, status
+    )
+
+    for row_day, transaction_type, cents in query.group_by(DailyLedgerRollup.date, DailyLedgerRollup.type):
+        if transaction_type not in series:
+            continue
+        if granularity == 'month':
+            index = row_day.year * 12 + row_day.month - 1 - first_month
+        elif granularity == 'week':
+            index = (row_day - first_day).days // 7
+        else:
+            index = (row_day - first_day).days
+        if 0 <= index < size:
+            series[transaction_type][index] += int(cents or 0)
+
+    return {
+        'labels': labels,
+        'income': [from_cents(cents) for cents in series['income']],
+        'expenses': [from_cents(cents) for cents in series['expense']]
+    }
+
+
+def budget_spend_query(start=None, end=None, status=None):
+    """budgets LEFT JOIN the expense rows of the daily ledger rollup, grouped by category."""
+    join_on = [
+        DailyLedgerRollup.category == Budget.category,
+        DailyLedgerRollup.type == 'expense'
+    ]
+    if start is not None:
+        first, last = _day_bounds(start, end)
+        join_on.append(DailyLedgerRollup.date >= first)
+        if last is not None:
+            join_on.append(DailyLedgerRollup.date < last)
+    if status is not None:
+        join_on.append(DailyLedgerRollup.status == status)
+
+    return db.session.query(
+        Budget.category,
+        Budget.budget_amount,
+        db.func.coalesce(_cents_sum(), 0)
+    ).outerjoin(
+        DailyLedgerRollup, db.and_(*join_on)
+    ).group_by(
+        Budget.category,
+        Budget.budget_amount
+    ).order_by(Budget.category)
+
+
+def budget_spend(start=None, end=None, status=None):
+    """Expense spend against every budget category for [start, end).
+
+    One query (budget_spend_query); start=None covers all time. Returns a
+    list of dicts with category, budget_amount and spent as Decimal amounts.
+    """
+    rows = budget_spend_query(start, end, status)
+    return [{
+        'category': category,
+        'budget_amount': budget_amount,
+        'spent': from_cents(spent or 0)
+    } for category, budget_amount, spent in rows]
+
+
+def evaluate_budgets(thresholds, start=None, end=None, status=None, inclusive=False):
+    """Return the budgets whose spend crosses one of the given thresholds.
+
+    thresholds is a sequence of (ratio, level) pairs, e.g.
+    ((1.0, 'warning'), (0.8, 'info')); each budget is reported once, at the
+    highest ratio its spend exceeds, or reaches when inclusive is set. Any
+    spend against a zero budget is reported at the highest level. Each
+    result carries category, budget_amount, spent, utilization (percent)
+    and level.
+    """
+    thresholds = sorted(thresholds, reverse=True)
+    crossings = []
+    for row in budget_spend(start, end, status):
+        budget_amount = row['budget_amount']
+        spent = row['spent']
+        if budget_amount <= 0:
+            if spent > 0:
+                row['level'] = thresholds[0][1]
+                row['utilization'] = 100.0
+                crossings.append(row)
+            continue
+        for ratio, level in thresholds:
+            limit = budget_amount * Decimal(str(ratio))
+            if spent >= limit if inclusive else spent > limit:
+                row['level'] = level
+                row['utilization'] = float(spent / budget_amount * 100)
+                crossings.append(row)
+                break
+    return crossings
+
+
+def payroll_history_query(first, end):
+    """Payroll SUM/COUNT per (year, month) of payment_date in [first, end)."""
+    year = db.func.extract('year', Payroll.payment_date)
+    month = db.func.extract('month', Payroll.payment_date)
+    return db.session.query(
+        year,
+        month,
+        db.func.sum(Payroll.salary_amount),
+        db.func.count(Payroll.id)
+    ).filter(
+        Payroll.payment_date >= first.date(),
+        Payroll.payment_date < end.date()
+    ).group_by(year, month)
+
+
+def payroll_history(months=6, now=None):
+    """Payroll total and record count for each of the last `months` calendar months.
+
+    One SUM/COUNT ... GROUP BY year, month query over payment_date; months
+    without payroll are filled with zeros. Returns newest month first, each
+    entry carrying month_start, total (Decimal) and count.
+    """
+    current = month_start(now)
+    first = add_months(current, -(months - 1))
+    end = add_months(current, 1)
+    rows = payroll_history_query(first, end)
+
+    totals = {(int(row_year), int(row_month)): (total, count) for row_year, row_month, total, count in rows}
+
+    history = []
+    for offset in range(months):
+        start = add_months(current, -offset)
+        total, count = totals.get((start.year, start.month), (None, 0))
+        history.append({
+            'month_start': start,
+            'total': total if total is not None else from_cents(0),
+            'count': count
+        })
+    return history
@@ -0,0 +1,106 @@
+import atexit
+import threading
+from datetime import datetime, timedelta
+from models import db, User
+
+
+class LastSeenBuffer:
+    """Write-behind buffer for users.last_seen.
+
+    Requests only record a timestamp in memory; repeated hits from the same
+    user coalesce into one pending value. A background thread writes the
+    pending values every flush_interval seconds with a single executemany
+    UPDATE. A hit is ignored when it moves last_seen by less than threshold
+    seconds past the last value this process recorded or the stored value,
+    so steady polling does not keep rewriting the same row.
+    """
+
+    def __init__(self, flush_interval=30, threshold=60):
+        self.flush_interval = flush_interval
+        self.threshold = timedelta(seconds=threshold)
+        self.flushed_rows = 0
+        self.app = None
+        self._pending = {}
+        self._recorded = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+        self.flush_interval = app.config.get('LAST_SEEN_FLUSH_SECONDS', self.flush_interval)
+        self.threshold = timedelta(seconds=app.config.get('LAST_SEEN_THRESHOLD_SECONDS', self.threshold.total_seconds()))
+        app.extensions['last_seen'] = self
+        atexit.register(self.stop)
+
+    @property
+    def pending_count(self):
+        return len(self._pending)
+
+    def touch(self, user_id, previous=None, seen_at=None):
+        """Record that a user was seen; previous is the last_seen value already stored."""
+        seen_at = seen_at or datetime.utcnow()
+        with self._lock:
+            # previous comes from the cached user row, which does not see this
+            # buffer's own flushes, so compare against the newer of the two
+            recorded = self._recorded.get(user_id)
+            if recorded is None or (previous is not None and previous > recorded):
+                recorded = previous
+            if recorded is not None and seen_at - recorded < self.threshold:
+                return False
+            self._pending[user_id] = seen_at
+            self._recorded[user_id] = seen_at
+        self._ensure_thread()
+        return True
+
+    def flush(self):
+        """Write all pending values in one batched UPDATE; returns rows written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        table = User.__table__
+        stmt = table.update().where(
+            table.c.id == db.bindparam('user_id')
+        ).values(last_seen=db.bindparam('seen_at'))
+        params = [{'user_id': user_id, 'seen_at': seen_at} for user_id, seen_at in pending.items()]
+
+        with self.app.app_context():
+            try:
+                db.session.execute(stmt, params)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                # Put the values back unless a newer hit arrived meanwhile
+                with self._lock:
+                    for user_id, seen_at in pending.items():
+                        self._pending.setdefault(user_id, seen_at)
+                self.app.logger.error(f"Failed to flush last seen updates: {str(e)}")
+                return 0
+            finally:
+                db.session.remove()
+
+        self.flushed_rows += len(params)
+        return len(params)
+
+    def _ensure_thread(self):
+        if self._thread is not None or self.app is None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='last-seen-flush', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def stop(self):
+        """Stop the flush thread and write whatever is still pending."""
+        self._stop.set()
+        if self.app is not None:
+            self.flush()
+
+
+last_seen = LastSeenBuffer()
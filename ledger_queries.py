@@ -0,0 +1,145 @@
+from datetime import datetime, timedelta
+from models import db, Transaction, Payroll, AuditLog
+from finance_aggregates import add_months, month_start
+
+
+def recent_transactions_query(start=None, end=None, limit=5):
+    """Newest transactions, optionally limited to [start, end)."""
+    query = Transaction.query
+    if start is not None:
+        query = query.filter(Transaction.date >= start)
+    if end is not None:
+        query = query.filter(Transaction.date < end)
+    return query.order_by(Transaction.date.desc()).limit(limit)
+
+
+def pending_transactions_query(department_id=None):
+    """Transactions awaiting approval, optionally for one department."""
+    query = Transaction.query.filter(Transaction.status == 'pending')
+    if department_id is not None:
+        query = query.filter(Transaction.department_id == department_id)
+    return query
+
+
+def upcoming_payments_query(until):
+    """Pending expenses dated on or before until."""
+    return Transaction.query.filter(
+        Transaction.type == 'expense',
+        Transaction.date <= until,
+        Transaction.status == 'pending'
+    )
+
+
+def department_expenses_query(department_id, start):
+    """SUM of a department's approved expenses dated from start."""
+    return db.session.query(db.func.sum(Transaction.amount)).filter(
+        Transaction.department_id == department_id,
+        Transaction.type == 'expense',
+        Transaction.status == 'approved',
+        Transaction.date >= start
+    )
+
+
+def department_transactions_query(department_id):
+    """A department's transactions, newest first."""
+    return Transaction.query.filter(
+        Transaction.department_id == department_id
+    ).order_by(Transaction.date.desc())
+
+
+def filtered_transactions(filters, user):
+    """Transaction query with the listing filters and department scoping applied.
+
+    filters holds the TRANSACTION_FILTERS request arguments as strings;
+    a malformed date or department id raises ValueError. Without a
+    department filter, users other than admin only see their own department.
+    """
+    query = Transaction.query
+
+    if filters.get('start_date'):
+        query = query.filter(Transaction.date >= datetime.strptime(filters['start_date'], '%Y-%m-%d'))
+    if filters.get('end_date'):
+        query = query.filter(Transaction.date <= datetime.strptime(filters['end_date'], '%Y-%m-%d'))
+    if filters.get('type'):
+        query = query.filter(Transaction.type == filters['type'])
+    if filters.get('category'):
+        query = query.filter(Transaction.category == filters['category'])
+    if filters.get('status'):
+        query = query.filter(Transaction.status == filters['status'])
+    if filters.get('department_id'):
+        query = query.filter(Transaction.department_id == int(filters['department_id']))
+    elif not user.role == 'admin':
+        query = query.filter(Transaction.department_id == user.department_id)
+    return query
+
+
+def transaction_export_query(filters, user):
+    """filtered_transactions in the export's (date, id) newest-first order."""
+    return filtered_transactions(filters, user).order_by(Transaction.date.desc(), Transaction.id.desc())
+
+
+def transaction_audit_query(transaction_id):
+    """Audit entries for one transaction, newest first."""
+    return AuditLog.query.filter(
+        AuditLog.resource_type == 'transaction',
+        AuditLog.resource_id == str(transaction_id)
+    ).order_by(AuditLog.timestamp.desc())
+
+
+def upcoming_payroll_query(after, until=None, status=None):
+    """Payroll paid after a moment (and up to until), earliest first."""
+    query = Payroll.query.filter(Payroll.payment_date > after)
+    if until is not None:
+        query = query.filter(Payroll.payment_date <= until)
+    if status is not None:
+        query = query.filter(Payroll.status == status)
+    return query.order_by(Payroll.payment_date)
+
+
+def pending_payroll_query(employee_ids):
+    """Every pending payroll record for a set of employees, earliest first."""
+    return Payroll.query.filter(
+        Payroll.employee_id.in_(list(employee_ids)),
+        Payroll.status == 'pending'
+    ).order_by(Payroll.payment_date)
+
+
+def payroll_month_query(month):
+    """Payroll records paid in the calendar month starting at month."""
+    return Payroll.query.filter(
+        Payroll.payment_date >= month.date(),
+        Payroll.payment_date < add_months(month, 1).date()
+    )
+
+
+def employee_payroll_month_query(employee_id, payment_date):
+    """An employee's payroll records in the calendar month of payment_date."""
+    first = month_start(payment_date)
+    return Payroll.query.filter(
+        Payroll.employee_id == employee_id,
+        Payroll.payment_date.between(first, add_months(first, 1))
+    )
+
+
+def payroll_export_query(start_date=None, end_date=None):
+    """Payroll paid in [start_date, end_date], newest first."""
+    query = Payroll.query
+    if start_date:
+        query = query.filter(Payroll.payment_date >= start_date.date())
+    if end_date:
+        query = query.filter(Payroll.payment_date <= end_date.date())
+    return query.order_by(Payroll.payment_date.desc(), Payroll.id.desc())
+
+
+def audit_log_export_query(start_date=None, end_date=None, action=None, resource_type=None):
+    """Audit entries from start_date through the end_date day, in id order."""
+    query = AuditLog.query
+    if start_date:
+        query = query.filter(AuditLog.timestamp >= start_date)
+    if end_date:
+        query = query.filter(AuditLog.timestamp < end_date + timedelta(days=1))
+    if action:
+        query = query.filter(AuditLog.action == action)
+    if resource_type:
+        query = query.filter(AuditLog.resource_type == resource_type)
+    return query.order_by(AuditLog.id)
@@ -0,0 +1,121 @@
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, Transaction, DailyLedgerRollup
+from money import to_cents
+
+ROLLUP_KEY = ('date', 'department_id', 'category', 'type', 'status')
+
+
+def ledger_entry(transaction):
+    """Return the (key, cents) a transaction currently contributes to the rollup.
+
+    Capture this before editing a transaction so its old contribution can be
+    reversed afterwards. Transactions without a date are not rolled up.
+    """
+    if transaction.date is None:
+        return None
+    key = (
+        transaction.date.date() if hasattr(transaction.date, 'date') else transaction.date,
+        int(transaction.department_id),
+        transaction.category,
+        transaction.type,
+        transaction.status or 'pending'
+    )
+    return key, to_cents(transaction.amount or 0)
+
+
+def apply_entry(entry, sign=1):
+    """Add (sign=1) or remove (sign=-1) a ledger entry in the current session."""
+    if entry is None:
+        return
+    key, cents = entry
+    apply_delta(key, cents * sign, sign)
+
+
+def apply_delta(key, cents, count):
+    """Add cents and count to one rollup bucket in the current session.
+
+    Uses a native upsert on MySQL and SQLite so concurrent writers touching
+    the same day/department/category bucket do not race on insert.
+    """
+    values = dict(zip(ROLLUP_KEY, key))
+    values['total_cents'] = cents
+    values['transaction_count'] = count
+
+    table = DailyLedgerRollup.__table__
+    dialect = db.engine.dialect.name
+    if dialect == 'mysql':
+        stmt = mysql_insert(table).values(**values)
+        stmt = stmt.on_duplicate_key_update(
+            total_cents=table.c.total_cents + stmt.inserted.total_cents,
+            transaction_count=table.c.transaction_count + stmt.inserted.transaction_count
+        )
+        db.session.execute(stmt)
+    elif dialect == 'sqlite':
+        stmt = sqlite_insert(table).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c[column] for column in ROLLUP_KEY],
+            set_={
+                'total_cents': table.c.total_cents + stmt.excluded.total_cents,
+                'transaction_count': table.c.transaction_count + stmt.excluded.transaction_count
+            }
+        )
+        db.session.execute(stmt)
+    else:
+        row = DailyLedgerRollup.query.get(key)
+        if row is None:
+            db.session.add(DailyLedgerRollup(**values))
+        else:
+            row.total_cents += values['total_cents']
+            row.transaction_count += values['transaction_count']
+
+
+def apply_deltas(deltas):
+    """Apply a {key: [cents, count]} mapping built up by a bulk write."""
+    for key, (cents, count) in deltas.items():
+        apply_delta(key, cents, count)
+
+
+def record_transaction(transaction, sign=1):
+    """Add (sign=1) or remove (sign=-1) a transaction's contribution to the rollup."""
+    apply_entry(ledger_entry(transaction), sign)
+
+
+def move_transaction(previous_entry, transaction):
+    """Replace a transaction's old rollup contribution with its current one."""
+    apply_entry(previous_entry, -1)
+    record_transaction(transaction)
+
+
+def rebuild_rollup():
+    """Recompute the whole rollup table from the transactions table.
+
+    Returns the number of rollup rows written. The caller commits.
+    """
+    day = db.func.date(Transaction.date)
+    status = db.func.coalesce(Transaction.status, 'pending')
+    source = db.session.query(
+        day,
+        Transaction.department_id,
+        Transaction.category,
+        Transaction.type,
+        status,
+        db.func.sum(Transaction.amount),
+        db.func.count(Transaction.id)
+    ).filter(
+        Transaction.date.isnot(None)
+    ).group_by(
+        day,
+        Transaction.department_id,
+        Transaction.category,
+        Transaction.type,
+        status
+    )
+
+    table = DailyLedgerRollup.__table__
+    DailyLedgerRollup.query.delete(synchronize_session=False)
+    db.session.execute(table.insert().from_select(
+        list(ROLLUP_KEY) + ['total_cents', 'transaction_count'],
+        source.statement
+    ))
+    return DailyLedgerRollup.query.count()
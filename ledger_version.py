@@ -0,0 +1,82 @@
+import hashlib
+from datetime import datetime
+from functools import wraps
+from flask import request, make_response
+from flask_login import current_user
+from models import db, LedgerVersion
+
+LEDGER_VERSION_ID = 1
+# Bumped by user edits so every process drops its cached users
+USER_VERSION_ID = 2
+
+
+def bump_version(version_id):
+    """Increment one version row as part of the current transaction."""
+    updated = LedgerVersion.query.filter_by(id=version_id).update({
+        'version': LedgerVersion.version + 1,
+        'updated_at': datetime.utcnow()
+    }, synchronize_session=False)
+    if not updated:
+        db.session.add(LedgerVersion(id=version_id, version=1))
+
+
+def current_version(version_id):
+    """Return one version row's value with a single primary-key lookup."""
+    version = db.session.query(LedgerVersion.version).filter_by(id=version_id).scalar()
+    return version or 0
+
+
+def bump_ledger_version():
+    """Increment the ledger version as part of the current transaction.
+
+    Call from every write path that changes data the polled JSON endpoints
+    report, before committing.
+    """
+    bump_version(LEDGER_VERSION_ID)
+
+
+def current_ledger_version():
+    """Return the current ledger version with a single primary-key lookup."""
+    return current_version(LEDGER_VERSION_ID)
+
+
+def ledger_etag():
+    """ETag for the current request at the current ledger version.
+
+    The ledger version, requesting user, full path and UTC date all feed the
+    tag, so per-user responses and date-relative windows never share one.
+    """
+    parts = (
+        current_ledger_version(),
+        current_user.get_id() if current_user.is_authenticated else '',
+        request.full_path,
+        datetime.utcnow().strftime('%Y-%m-%d')
+    )
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def conditional_on_etag(make_etag):
+    """Decorator factory: answer a matching If-None-Match with 304 before the view runs.
+
+    make_etag is called once per request and must change whenever the
+    view's response would.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            etag = make_etag()
+            if etag in request.if_none_match:
+                response = make_response('', 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated_function
+    return decorator
+
+
+# For views whose response depends only on ledger data
+conditional_on_ledger_version = conditional_on_etag(ledger_etag)
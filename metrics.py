@@ -0,0 +1,177 @@
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from flask import Response, request, abort
+from flask_login import current_user
+from db_pool import pool_stats
+from pagination import count_cache
+
+# Request latency histogram bucket bounds, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _sample(name, value, **labels):
+    if labels:
+        label_text = ','.join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+        return f'{name}{{{label_text}}} {value}'
+    return f'{name} {value}'
+
+
+class Metrics:
+    """Request counters kept in process and rendered in the Prometheus text format.
+
+    The per-request work is a bisect into the latency buckets and a few
+    integer updates under one lock. Everything else (pool, audit queue,
+    caches) is read from its owner when /metrics is scraped. Counts are per
+    process; scrape each worker separately when running several.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.token = None
+        self.in_flight = 0
+        self._latency = {}  # endpoint -> [bucket counts..., +Inf count, sum]
+        self._responses = {}  # (endpoint, status class) -> count
+        self._rate_limited = {}  # endpoint -> count of 429 responses
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.token = app.config.get('METRICS_TOKEN')
+        app.before_request(self._start)
+        app.after_request(self._observe)
+        app.teardown_request(self._finish)
+        app.add_url_rule('/metrics', 'metrics', self.view)
+        app.extensions['metrics'] = self
+
+    def _start(self):
+        request.environ['metrics.start'] = time.perf_counter()
+        with self._lock:
+            self.in_flight += 1
+
+    def _observe(self, response):
+        # metrics registers its hooks before the rate limiter (app.py), so
+        # _start has run and 429s are timed like any response; start is only
+        # missing if a hook registered ahead of metrics rejected the request
+        current = request._get_current_object()
+        start = current.environ.get('metrics.start')
+        endpoint = current.endpoint or 'unmatched'
+        status = response.status_code
+        with self._lock:
+            if start is not None:
+                elapsed = time.perf_counter() - start
+                histogram = self._latency.get(endpoint)
+                if histogram is None:
+                    histogram = self._latency[endpoint] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+                histogram[bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+                histogram[-1] += elapsed
+            key = (endpoint, f'{status // 100}xx')
+            self._responses[key] = self._responses.get(key, 0) + 1
+            if status == 429:
+                self._rate_limited[endpoint] = self._rate_limited.get(endpoint, 0) + 1
+        return response
+
+    def _finish(self, exception=None):
+        if request.environ.pop('metrics.start', None) is not None:
+            with self._lock:
+                self.in_flight -= 1
+
+    def authorized(self):
+        """A scrape is allowed with the METRICS_TOKEN bearer token or as an admin."""
+        header = request.headers.get('Authorization', '')
+        if self.token and header.startswith('Bearer '):
+            return hmac.compare_digest(header[7:], self.token)
+        return current_user.is_authenticated and current_user.role == 'admin'
+
+    def view(self):
+        if not self.authorized():
+            abort(403)
+        return Response(self.render(), content_type=CONTENT_TYPE)
+
+    def render(self):
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(samples)
+
+        with self._lock:
+            latency = {endpoint: list(histogram) for endpoint, histogram in self._latency.items()}
+            responses = dict(self._responses)
+            rate_limited = dict(self._rate_limited)
+            in_flight = self.in_flight
+
+        samples = []
+        for endpoint, histogram in sorted(latency.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), histogram):
+                cumulative += count
+                samples.append(_sample('http_request_duration_seconds_bucket', cumulative, endpoint=endpoint, le=bound))
+            samples.append(_sample('http_request_duration_seconds_sum', f'{histogram[-1]:.6f}', endpoint=endpoint))
+            samples.append(_sample('http_request_duration_seconds_count', cumulative, endpoint=endpoint))
+        family('http_request_duration_seconds', 'histogram',
+               'Time to build the response, per endpoint.', samples)
+        family('http_responses_total', 'counter', 'Responses per endpoint and status class.',
+               [_sample('http_responses_total', count, endpoint=endpoint, status=status)
+                for (endpoint, status), count in sorted(responses.items())])
+        family('http_requests_in_flight', 'gauge', 'Requests being handled right now.',
+               [_sample('http_requests_in_flight', in_flight)])
+        family('http_rate_limited_total', 'counter', 'Requests rejected by the rate limiter (429).',
+               [_sample('http_rate_limited_total', count, endpoint=endpoint)
+                for endpoint, count in sorted(rate_limited.items())])
+
+        for name, kind, help_text, values in self._collect():
+            family(name, kind, help_text, [_sample(name, value, **labels) for labels, value in values])
+        return '\n'.join(lines) + '\n'
+
+    def _collect(self):
+        """Gauges read from the pool, background writers and caches at scrape time."""
+        extensions = self.app.extensions
+        pool = pool_stats()
+        if 'size' in pool:
+            yield ('db_pool_size', 'gauge', 'Configured connection pool size.', [({}, pool['size'])])
+            yield ('db_pool_checked_out', 'gauge', 'Connections currently checked out.', [({}, pool['checked_out'])])
+            yield ('db_pool_overflow', 'gauge', 'Connections open beyond the pool size.', [({}, pool['overflow'])])
+            yield ('db_pool_checked_in', 'gauge', 'Idle connections in the pool.', [({}, pool['checked_in'])])
+        yield ('db_pool_connects_total', 'counter', 'Database connections opened.', [({}, pool['connects'])])
+        yield ('db_pool_invalidations_total', 'counter', 'Connections discarded by recycle or invalidation.',
+               [({}, pool['invalidations'])])
+        yield ('db_pool_disconnects_total', 'counter', 'Connections invalidated after a disconnect error.',
+               [({}, pool['disconnects'])])
+
+        audit_sink = extensions.get('audit_sink')
+        if audit_sink is not None:
+            yield ('audit_queue_depth', 'gauge', 'Audit entries waiting for the next flush.', [({}, audit_sink.queue_depth)])
+            yield ('audit_rows_written_total', 'counter', 'Audit entries written to the database.', [({}, audit_sink.written_rows)])
+            yield ('audit_rows_spilled_total', 'counter', 'Audit entries kept only in the spill journal because the queue was full.',
+                   [({}, audit_sink.spilled_rows)])
+
+        last_seen = extensions.get('last_seen')
+        if last_seen is not None:
+            yield ('last_seen_pending', 'gauge', 'Users with a buffered last_seen update.', [({}, last_seen.pending_count)])
+
+        hub = extensions.get('event_hub')
+        if hub is not None:
+            yield ('sse_connections', 'gauge', 'Open dashboard event streams.', [({}, hub.connection_count)])
+
+        caches = {'user_cache': extensions.get('user_cache'), 'count_cache': count_cache}
+        stats = {name: cache.stats() for name, cache in caches.items() if cache is not None}
+        yield ('cache_hits_total', 'counter', 'In-process cache hits.',
+               [({'cache': name}, s['hits']) for name, s in stats.items()])
+        yield ('cache_misses_total', 'counter', 'In-process cache misses.',
+               [({'cache': name}, s['misses']) for name, s in stats.items()])
+        yield ('cache_hit_ratio', 'gauge', 'In-process cache hit ratio since start-up.',
+               [({'cache': name}, f"{s['hit_ratio']:.4f}") for name, s in stats.items()])
+        yield ('cache_entries', 'gauge', 'Entries held by each in-process cache.',
+               [({'cache': name}, s['size']) for name, s in stats.items()])
+
+
+metrics = Metrics()
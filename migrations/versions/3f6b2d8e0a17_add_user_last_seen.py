@@ -0,0 +1,26 @@
+"""Add user last seen
+
+Revision ID: 3f6b2d8e0a17
+Revises: e81f4a9c6d20
+Create Date: 2026-10-18 16:12:09.662035
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6b2d8e0a17'
+down_revision = 'e81f4a9c6d20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_seen', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('last_seen')
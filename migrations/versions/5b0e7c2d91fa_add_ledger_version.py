@@ -0,0 +1,30 @@
+"""Add ledger version
+
+Revision ID: 5b0e7c2d91fa
+Revises: c4e1f09a7d52
+Create Date: 2026-10-18 13:02:47.561390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b0e7c2d91fa'
+down_revision = 'c4e1f09a7d52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ledger_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("INSERT INTO ledger_version (id, version) VALUES (1, 0)")
+
+
+def downgrade():
+    op.drop_table('ledger_version')
@@ -0,0 +1,42 @@
+"""Add daily ledger rollup
+
+Revision ID: 74dba88bddd3
+Revises: 2ae278dd1ab3
+Create Date: 2026-10-18 10:12:31.482913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '74dba88bddd3'
+down_revision = '2ae278dd1ab3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('daily_ledger_rollup',
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('department_id', sa.Integer(), nullable=False),
+    sa.Column('category', sa.String(length=50), nullable=False),
+    sa.Column('type', sa.String(length=20), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('total_amount', sa.Float(), nullable=False),
+    sa.Column('transaction_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('date', 'department_id', 'category', 'type', 'status')
+    )
+
+    # Populate from the existing ledger; afterwards the write paths keep it current
+    op.execute(
+        "INSERT INTO daily_ledger_rollup "
+        "(date, department_id, category, type, status, total_amount, transaction_count) "
+        "SELECT DATE(date), department_id, category, type, COALESCE(status, 'pending'), "
+        "SUM(amount), COUNT(id) FROM transactions WHERE date IS NOT NULL "
+        "GROUP BY DATE(date), department_id, category, type, COALESCE(status, 'pending')"
+    )
+
+
+def downgrade():
+    op.drop_table('daily_ledger_rollup')
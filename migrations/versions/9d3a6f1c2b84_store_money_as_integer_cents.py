@@ -0,0 +1,81 @@
+"""Store money as integer cents
+
+Revision ID: 9d3a6f1c2b84
+Revises: 5b0e7c2d91fa
+Create Date: 2026-10-18 14:21:05.318442
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d3a6f1c2b84'
+down_revision = '5b0e7c2d91fa'
+branch_labels = None
+depends_on = None
+
+# (table, column, nullable)
+MONEY_COLUMNS = (
+    ('transactions', 'amount', False),
+    ('budgets', 'budget_amount', False),
+    ('departments', 'budget_limit', True),
+    ('payroll', 'salary_amount', False),
+)
+
+
+def _rebuild_rollup():
+    op.execute("DELETE FROM daily_ledger_rollup")
+    op.execute(
+        "INSERT INTO daily_ledger_rollup "
+        "(date, department_id, category, type, status, total_cents, transaction_count) "
+        "SELECT DATE(date), department_id, category, type, COALESCE(status, 'pending'), "
+        "SUM(amount), COUNT(id) FROM transactions WHERE date IS NOT NULL "
+        "GROUP BY DATE(date), department_id, category, type, COALESCE(status, 'pending')"
+    )
+
+
+def upgrade():
+    # Copy each Float amount into a BIGINT cents column, then swap the columns
+    for table, column, nullable in MONEY_COLUMNS:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column(f'{column}_cents', sa.BigInteger(), nullable=True))
+
+        op.execute(f"UPDATE {table} SET {column}_cents = ROUND({column} * 100)")
+
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column(column)
+            batch_op.alter_column(f'{column}_cents',
+                   new_column_name=column,
+                   existing_type=sa.BigInteger(),
+                   nullable=nullable)
+
+    with op.batch_alter_table('daily_ledger_rollup', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('total_cents', sa.BigInteger(), nullable=False, server_default='0'))
+        batch_op.drop_column('total_amount')
+
+    # Re-sum from the converted ledger rather than scaling the drifted float totals
+    _rebuild_rollup()
+
+
+def downgrade():
+    with op.batch_alter_table('daily_ledger_rollup', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('total_amount', sa.Float(), nullable=False, server_default='0'))
+
+    op.execute("UPDATE daily_ledger_rollup SET total_amount = total_cents / 100.0")
+
+    with op.batch_alter_table('daily_ledger_rollup', schema=None) as batch_op:
+        batch_op.drop_column('total_cents')
+
+    for table, column, nullable in MONEY_COLUMNS:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column(f'{column}_float', sa.Float(), nullable=True))
+
+        op.execute(f"UPDATE {table} SET {column}_float = {column} / 100.0")
+
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column(column)
+            batch_op.alter_column(f'{column}_float',
+                   new_column_name=column,
+                   existing_type=sa.Float(),
+                   nullable=nullable)
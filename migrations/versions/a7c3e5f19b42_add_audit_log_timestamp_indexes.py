@@ -0,0 +1,30 @@
+"""Add audit log timestamp indexes
+
+Revision ID: a7c3e5f19b42
+Revises: 3f6b2d8e0a17
+Create Date: 2026-10-18 20:24:51.318406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e5f19b42'
+down_revision = '3f6b2d8e0a17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('audit_logs', schema=None) as batch_op:
+        batch_op.create_index('ix_audit_logs_resource_timestamp', ['resource_type', 'resource_id', 'timestamp'], unique=False)
+        batch_op.create_index('ix_audit_logs_timestamp', ['timestamp'], unique=False)
+        batch_op.drop_index('ix_audit_logs_resource')
+
+
+def downgrade():
+    with op.batch_alter_table('audit_logs', schema=None) as batch_op:
+        batch_op.create_index('ix_audit_logs_resource', ['resource_type', 'resource_id'], unique=False)
+        batch_op.drop_index('ix_audit_logs_timestamp')
+        batch_op.drop_index('ix_audit_logs_resource_timestamp')
@@ -0,0 +1,24 @@
+"""Seed user version
+
+Revision ID: d2b8f6a4c913
+Revises: a7c3e5f19b42
+Create Date: 2026-10-18 20:52:10.284117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2b8f6a4c913'
+down_revision = 'a7c3e5f19b42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("INSERT INTO ledger_version (id, version) VALUES (2, 0)")
+
+
+def downgrade():
+    op.execute("DELETE FROM ledger_version WHERE id = 2")
@@ -0,0 +1,46 @@
+"""Add ledger query indexes
+
+Revision ID: e81f4a9c6d20
+Revises: 9d3a6f1c2b84
+Create Date: 2026-10-18 15:07:42.904117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e81f4a9c6d20'
+down_revision = '9d3a6f1c2b84'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.create_index('ix_transactions_date', ['date'], unique=False)
+        batch_op.create_index('ix_transactions_department_date', ['department_id', 'date'], unique=False)
+        batch_op.create_index('ix_transactions_category_type_date', ['category', 'type', 'date'], unique=False)
+        batch_op.create_index('ix_transactions_status_date', ['status', 'date'], unique=False)
+
+    with op.batch_alter_table('payroll', schema=None) as batch_op:
+        batch_op.create_index('ix_payroll_payment_date', ['payment_date'], unique=False)
+        batch_op.create_index('ix_payroll_employee_payment_date', ['employee_id', 'payment_date'], unique=False)
+
+    with op.batch_alter_table('audit_logs', schema=None) as batch_op:
+        batch_op.create_index('ix_audit_logs_resource', ['resource_type', 'resource_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('audit_logs', schema=None) as batch_op:
+        batch_op.drop_index('ix_audit_logs_resource')
+
+    with op.batch_alter_table('payroll', schema=None) as batch_op:
+        batch_op.drop_index('ix_payroll_employee_payment_date')
+        batch_op.drop_index('ix_payroll_payment_date')
+
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_index('ix_transactions_status_date')
+        batch_op.drop_index('ix_transactions_category_type_date')
+        batch_op.drop_index('ix_transactions_department_date')
+        batch_op.drop_index('ix_transactions_date')
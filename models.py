@@ -1,8 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, timedelta
+from datetime import datetime, date, timedelta
 from flask import current_app
+from money import Money, from_cents
 
 db = SQLAlchemy()
 
@@ -16,6 +17,7 @@ class User(UserMixin, db.Model):
     department_id = db.Column(db.Integer, db.ForeignKey('departments.id', ondelete='SET NULL'), nullable=True)
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_seen = db.Column(db.DateTime, nullable=True)  # written in batches by last_seen.py
     
     # Relationships
     department = db.relationship('Department', back_populates='employees')
@@ -102,6 +104,20 @@ class User(UserMixin, db.Model):
         """Check if user can process payroll payments."""
         return self.role in ['admin', 'finance']
 
+    def can_manage_department(self, department_id):
+        """Check if user can approve or reject a department's transactions."""
+        if self.role in ['admin', 'finance']:
+            return True
+        return self.role == 'manager' and self.department_id == department_id
+
+    def managed_department_ids(self):
+        """Departments whose transactions the user may review; None means all."""
+        if self.role in ['admin', 'finance']:
+            return None
+        if self.role == 'manager' and self.department_id is not None:
+            return [self.department_id]
+        return []
+
     def can_manage_users(self):
         """Check if user can manage other users."""
         return self.role == 'admin'
@@ -113,46 +129,59 @@ class Department(db.Model):
     __tablename__ = 'departments'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
-    budget_limit = db.Column(db.Float, default=0.0)
+    budget_limit = db.Column(Money, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
     employees = db.relationship('User', back_populates='department')
     transactions = db.relationship('Transaction', back_populates='department')
     
-    def get_monthly_expenses(self, year=None, month=None):
+    @classmethod
+    def monthly_totals(cls, dept_ids, year=None, month=None):
+        """Income and expense totals for one month, for many departments at once.
+        
+        Runs a single SUM ... GROUP BY department_id, type over the daily
+        ledger rollup and returns {dept_id: {'income': Decimal, 'expense': Decimal}}
+        with an entry, defaulting to zero, for every requested department.
+        """
         if year is None or month is None:
             now = datetime.utcnow()
             year = now.year
             month = now.month
             
-        start_date = datetime(year, month, 1)
+        start_date = date(year, month, 1)
         if month == 12:
-            end_date = datetime(year + 1, 1, 1)
+            end_date = date(year + 1, 1, 1)
         else:
-            end_date = datetime(year, month + 1, 1)
+            end_date = date(year, month + 1, 1)
+        
+        dept_ids = list(dept_ids)
+        cents = {dept_id: {'income': 0, 'expense': 0} for dept_id in dept_ids}
+        if dept_ids:
+            rows = db.session.query(
+                DailyLedgerRollup.department_id,
+                DailyLedgerRollup.type,
+                db.func.sum(DailyLedgerRollup.total_cents)
+            ).filter(
+                DailyLedgerRollup.department_id.in_(dept_ids),
+                DailyLedgerRollup.date >= start_date,
+                DailyLedgerRollup.date < end_date
+            ).group_by(DailyLedgerRollup.department_id, DailyLedgerRollup.type)
             
-        total = sum(t.amount for t in self.transactions 
-                   if t.type == 'expense' 
-                   and start_date <= t.date < end_date)
-        return total
+            for dept_id, transaction_type, total in rows:
+                if transaction_type in cents[dept_id]:
+                    cents[dept_id][transaction_type] = int(total or 0)
+        
+        return {
+            dept_id: {transaction_type: from_cents(total) for transaction_type, total in totals.items()}
+            for dept_id, totals in cents.items()
+        }
+    
+    def get_monthly_expenses(self, year=None, month=None):
+        return Department.monthly_totals([self.id], year, month)[self.id]['expense']
     
     def get_monthly_income(self, year=None, month=None):
-        if year is None or month is None:
-            now = datetime.utcnow()
-            year = now.year
-            month = now.month
-            
-        start_date = datetime(year, month, 1)
-        if month == 12:
-            end_date = datetime(year + 1, 1, 1)
-        else:
-            end_date = datetime(year, month + 1, 1)
-            
-        total = sum(t.amount for t in self.transactions 
-                   if t.type == 'income' 
-                   and start_date <= t.date < end_date)
-        return total
+        return Department.monthly_totals([self.id], year, month)[self.id]['income']
 
     def __repr__(self):
         return f'<Department {self.name}>'
@@ -160,7 +189,7 @@ class Department(db.Model):
 class Budget(db.Model):
     __tablename__ = 'budgets'
     category = db.Column(db.String(50), primary_key=True)
-    budget_amount = db.Column(db.Float, nullable=False)
+    budget_amount = db.Column(Money, nullable=False)
     
     # Relationships
     transactions = db.relationship('Transaction', back_populates='budget')
@@ -172,7 +201,7 @@ class Budget(db.Model):
     def to_dict(self):
         return {
             'category': self.category,
-            'budget_amount': self.budget_amount
+            'budget_amount': float(self.budget_amount)
         }
     
     def __repr__(self):
@@ -182,7 +211,7 @@ class Transaction(db.Model):
     __tablename__ = 'transactions'
     id = db.Column(db.Integer, primary_key=True)
     type = db.Column(db.String(20), nullable=False)  # income/expense
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(Money, nullable=False)
     description = db.Column(db.String(200))
     date = db.Column(db.DateTime, default=datetime.utcnow)
     category = db.Column(db.String(50), db.ForeignKey('budgets.category'), nullable=False)
@@ -198,6 +227,13 @@ class Transaction(db.Model):
     creator = db.relationship('User', foreign_keys=[creator_id])
     approver = db.relationship('User', foreign_keys=[approver_id])
     
+    __table_args__ = (
+        db.Index('ix_transactions_date', 'date'),
+        db.Index('ix_transactions_department_date', 'department_id', 'date'),
+        db.Index('ix_transactions_category_type_date', 'category', 'type', 'date'),
+        db.Index('ix_transactions_status_date', 'status', 'date'),
+    )
+    
     def __init__(self, type, amount, description, category, department_id, creator_id, date=None, status='pending'):
         self.type = type
         self.amount = amount
@@ -208,11 +244,14 @@ class Transaction(db.Model):
         self.date = date if date else datetime.utcnow()
         self.status = status
     
+    # Relationships read by to_dict, eager-loaded by serializers.py
+    serialize_relationships = ('creator', 'approver', 'department')
+    
     def to_dict(self):
         return {
             'id': self.id,
             'type': self.type,
-            'amount': self.amount,
+            'amount': float(self.amount),
             'description': self.description,
             'date': self.date.strftime('%Y-%m-%d %H:%M:%S'),
             'category': self.category,
@@ -230,7 +269,7 @@ class Payroll(db.Model):
     __tablename__ = 'payroll'
     id = db.Column(db.Integer, primary_key=True)
     employee_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    salary_amount = db.Column(db.Float, nullable=False)
+    salary_amount = db.Column(Money, nullable=False)
     payment_date = db.Column(db.Date, nullable=False)
     status = db.Column(db.String(20), default='pending')  # pending, paid
     notes = db.Column(db.Text)
@@ -239,16 +278,49 @@ class Payroll(db.Model):
     # Relationships
     employee = db.relationship('User', foreign_keys=[employee_id])
     
+    __table_args__ = (
+        db.Index('ix_payroll_payment_date', 'payment_date'),
+        db.Index('ix_payroll_employee_payment_date', 'employee_id', 'payment_date'),
+    )
+    
     def __init__(self, employee_id, salary_amount, payment_date):
         self.employee_id = employee_id
         self.salary_amount = salary_amount
         self.payment_date = payment_date
     
+    @classmethod
+    def latest_for_employees(cls, employee_ids):
+        """Map each employee id to their most recent payroll record.
+        
+        One grouped-max query for the whole set: the latest payment_date per
+        employee joined back to payroll (ties go to the highest id).
+        Employees without payroll are absent from the result.
+        """
+        employee_ids = list(employee_ids)
+        if not employee_ids:
+            return {}
+        
+        latest = db.session.query(
+            cls.employee_id,
+            db.func.max(cls.payment_date).label('payment_date')
+        ).filter(
+            cls.employee_id.in_(employee_ids)
+        ).group_by(cls.employee_id).subquery()
+        
+        records = cls.query.join(latest, db.and_(
+            cls.employee_id == latest.c.employee_id,
+            cls.payment_date == latest.c.payment_date
+        )).order_by(cls.id)
+        
+        return {record.employee_id: record for record in records}
+    
+    serialize_relationships = ('employee',)
+    
     def to_dict(self):
         return {
             'id': self.id,
             'employee': self.employee.username,
-            'salary_amount': self.salary_amount,
+            'salary_amount': float(self.salary_amount),
             'payment_date': self.payment_date.strftime('%Y-%m-%d'),
             'status': self.status,
             'notes': self.notes
@@ -271,13 +343,21 @@ class AuditLog(db.Model):
     # Relationship
     user = db.relationship('User', foreign_keys=[user_id])
     
-    def __init__(self, user_id, action, resource_type, resource_id=None, details=None, ip_address=None):
+    __table_args__ = (
+        db.Index('ix_audit_logs_resource_timestamp', 'resource_type', 'resource_id', 'timestamp'),
+        db.Index('ix_audit_logs_timestamp', 'timestamp'),
+    )
+    
+    def __init__(self, user_id, action, resource_type, resource_id=None, details=None, ip_address=None, timestamp=None):
         self.user_id = user_id
         self.action = action
         self.resource_type = resource_type
         self.resource_id = resource_id
         self.details = details
         self.ip_address = ip_address
+        self.timestamp = timestamp
+    
+    serialize_relationships = ('user',)
     
     def to_dict(self):
         return {
@@ -293,3 +373,55 @@ class AuditLog(db.Model):
     
     def __repr__(self):
         return f'<AuditLog {self.id}: {self.action} on {self.resource_type}>'
+
+class DailyLedgerRollup(db.Model):
+    __tablename__ = 'daily_ledger_rollup'
+    date = db.Column(db.Date, primary_key=True)
+    department_id = db.Column(db.Integer, primary_key=True)
+    category = db.Column(db.String(50), primary_key=True)
+    type = db.Column(db.String(20), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    total_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<DailyLedgerRollup {self.date} {self.department_id} {self.category} {self.type} {self.status}: {self.total_cents}>'
+
+class Notification(db.Model):
+    __tablename__ = 'notifications'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    key = db.Column(db.String(120), nullable=False)  # dedupe key, e.g. budget:Food:warning:2025-03
+    type = db.Column(db.String(20), nullable=False, default='info')  # info, warning, danger
+    message = db.Column(db.String(200), nullable=False)
+    details = db.Column(db.String(255), nullable=True)
+    is_read = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    read_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'key', name='uq_notifications_user_key'),
+        db.Index('ix_notifications_user_read', 'user_id', 'is_read', 'created_at'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.type,
+            'message': self.message,
+            'details': self.details,
+            'read': self.is_read,
+            'timestamp': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None
+        }
+    
+    def __repr__(self):
+        return f'<Notification {self.id}: {self.key} for user {self.user_id}>'
+
+class LedgerVersion(db.Model):
+    __tablename__ = 'ledger_version'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<LedgerVersion {self.version}>'
@@ -0,0 +1,66 @@
+from decimal import Decimal, ROUND_HALF_UP
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy.types import TypeDecorator, BigInteger
+
+CENT = Decimal('0.01')
+
+
+def to_cents(value):
+    """Convert an amount in major units (str, int, float or Decimal) to integer cents."""
+    if value is None:
+        return None
+    if isinstance(value, float):
+        # repr() gives the shortest string that round-trips, so 0.1 becomes '0.1'
+        value = repr(value)
+    return int((Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP) * 100).to_integral_value())
+
+
+def from_cents(cents):
+    """Convert integer cents to an exact Decimal amount in major units."""
+    if cents is None:
+        return None
+    return (Decimal(int(cents)) / 100).quantize(CENT)
+
+
+def format_money(value):
+    """Render an amount with thousands separators and two decimals, e.g. 1,234.50."""
+    if isinstance(value, float):
+        value = repr(value)
+    amount = Decimal(value or 0).quantize(CENT, rounding=ROUND_HALF_UP)
+    return f'{amount:,.2f}'
+
+
+def json_default(value):
+    """json.dumps default that writes Decimal amounts as plain numbers."""
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+class Money(TypeDecorator):
+    """Monetary amount stored as BIGINT cents.
+
+    Values are assigned in major units (float, str or Decimal) and read back
+    as Decimal, so SUM() runs over exact integers in the database.
+    """
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return to_cents(value)
+
+    def process_result_value(self, value, dialect):
+        return from_cents(value)
+
+    def process_literal_param(self, value, dialect):
+        return str(to_cents(value))
+
+
+class MoneyJSONProvider(DefaultJSONProvider):
+    """JSON provider that serialises Decimal amounts as numbers instead of strings."""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, Decimal):
+            return float(o)
+        return DefaultJSONProvider.default(o)
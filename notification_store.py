@@ -0,0 +1,124 @@
+import hashlib
+from datetime import datetime
+from flask import request
+from flask_login import current_user
+from models import db, User, Notification
+from finance_aggregates import evaluate_budgets, month_start, NOTIFICATION_THRESHOLDS
+
+
+def _budget_notifications(now):
+    # Spend is evaluated month to date, the same window the key names, so a
+    # budget crosses each level at most once per key
+    period = now.strftime('%Y-%m')
+    for budget in evaluate_budgets(NOTIFICATION_THRESHOLDS, month_start(now)):
+        if budget['level'] == 'warning':
+            message = f'Budget alert for {budget["category"]}'
+        else:
+            message = f'Budget threshold warning for {budget["category"]}'
+        yield {
+            # One notification per budget, level and month
+            'key': f'budget:{budget["category"]}:{budget["level"]}:{period}',
+            'type': budget['level'],
+            'message': message,
+            'details': f'Used {budget["utilization"]:.1f}% of budget this month'
+        }
+
+
+def refresh_budget_notifications(now=None):
+    """Create notifications for budget thresholds crossed since the last run.
+
+    Call this from write paths that change ledger or budget data, before
+    committing. Every active user receives them, as with the alerts the
+    notifications endpoint used to compute. Existing (user, key) pairs are
+    skipped, so each recipient is notified once per budget, level and month.
+    Returns the number of notifications created.
+    """
+    now = now or datetime.utcnow()
+    pending = {n['key']: n for n in _budget_notifications(now)}
+    if not pending:
+        return 0
+
+    recipients = [user_id for (user_id,) in db.session.query(User.id).filter(
+        User.is_active.is_(True)
+    )]
+    if not recipients:
+        return 0
+
+    existing = set(db.session.query(Notification.user_id, Notification.key).filter(
+        Notification.user_id.in_(recipients),
+        Notification.key.in_(list(pending))
+    ))
+    rows = [
+        dict(pending[key], user_id=user_id, is_read=False, created_at=now)
+        for user_id in recipients
+        for key in pending
+        if (user_id, key) not in existing
+    ]
+    if rows:
+        # A concurrent writer may insert the same (user, key); let the unique key absorb it
+        insert = Notification.__table__.insert()
+        dialect = db.engine.dialect.name
+        if dialect == 'mysql':
+            insert = insert.prefix_with('IGNORE')
+        elif dialect == 'sqlite':
+            insert = insert.prefix_with('OR IGNORE')
+        db.session.execute(insert, rows)
+    return len(rows)
+
+
+def ensure_notifications(user_id):
+    """Run the refresh for a user who has never had a notification.
+
+    Covers reads that come before any write path has refreshed, such as
+    right after the notifications table is deployed or for a new user.
+    Returns the number of notifications created; the caller commits.
+    """
+    if db.session.query(Notification.id).filter_by(user_id=user_id).first() is not None:
+        return 0
+    return refresh_budget_notifications()
+
+
+def unread_query(user_id):
+    """A user's unread notifications, newest first."""
+    return Notification.query.filter_by(
+        user_id=user_id, is_read=False
+    ).order_by(Notification.created_at.desc())
+
+
+def unread_notifications(user_id, limit=20):
+    """Return (unread count, newest unread notifications) for a user."""
+    query = unread_query(user_id)
+    notifications = query.limit(limit).all()
+    if len(notifications) < limit:
+        return len(notifications), notifications
+    return query.order_by(None).count(), notifications
+
+
+def notification_etag():
+    """ETag for the current user's unread notifications.
+
+    Notification ids only grow and a read notification never becomes unread
+    again, so the unread count and newest unread id change whenever the
+    unread set does. Both come from the (user_id, is_read) index, and one
+    user's reads leave every other user's tags alone.
+    """
+    count, newest = db.session.query(
+        db.func.count(Notification.id),
+        db.func.max(Notification.id)
+    ).filter(
+        Notification.user_id == current_user.id,
+        Notification.is_read.is_(False)
+    ).one()
+    parts = (current_user.id, count, newest or 0, request.full_path)
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def mark_read(user_id, notification_id=None):
+    """Mark one notification, or all of a user's unread notifications, as read.
+
+    Returns the number of notifications updated. The caller commits.
+    """
+    query = Notification.query.filter_by(user_id=user_id, is_read=False)
+    if notification_id is not None:
+        query = query.filter_by(id=notification_id)
+    return query.update({'is_read': True, 'read_at': datetime.utcnow()}, synchronize_session=False)
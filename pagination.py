@@ -0,0 +1,125 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from models import db
+from cache import TTLCache
+
+# Approximate listing totals, keyed by listing name and filters
+count_cache = TTLCache(maxsize=256, ttl=300)
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def encode_cursor(date, id):
+    """Pack a (date, id) position into an opaque URL-safe token."""
+    raw = json.dumps([date.isoformat(), id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Unpack a token from encode_cursor back into (date, id)."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        date, id = json.loads(raw)
+        return datetime.fromisoformat(date), int(id)
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise InvalidCursor(str(e))
+
+
+class KeysetPage:
+    """One page of a keyset-paginated query, newest first."""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None, total=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def keyset_query(query, date_column, id_column, per_page, after=None, before=None):
+    """The SELECT keyset_page runs for one page of query.
+
+    The seek predicate is expanded to date < d OR (date = d AND id < i) so
+    it can use a (..., date) index instead of an OFFSET scan, and one extra
+    row is fetched to detect whether another page exists. Pages before a
+    cursor come back oldest first.
+    """
+    if before is not None:
+        date, id = decode_cursor(before)
+        return query.filter(db.or_(
+            date_column > date,
+            db.and_(date_column == date, id_column > id)
+        )).order_by(date_column.asc(), id_column.asc()).limit(per_page + 1)
+    if after is not None:
+        date, id = decode_cursor(after)
+        query = query.filter(db.or_(
+            date_column < date,
+            db.and_(date_column == date, id_column < id)
+        ))
+    return query.order_by(date_column.desc(), id_column.desc()).limit(per_page + 1)
+
+
+def keyset_page(query, date_column, id_column, per_page, after=None, before=None):
+    """Fetch one page of query ordered by (date, id) descending.
+
+    after is the cursor of the last row on the previous page (move to older
+    rows); before is the cursor of the first row on the next page (move back
+    to newer rows). The rows come from keyset_query.
+    """
+    rows = keyset_query(query, date_column, id_column, per_page, after, before).all()
+    more = len(rows) > per_page
+    if before is not None:
+        items = list(reversed(rows[:per_page]))
+        has_newer, has_older = more, True
+    else:
+        items = rows[:per_page]
+        has_newer, has_older = after is not None, more
+
+    def cursor(item):
+        return encode_cursor(getattr(item, date_column.key), getattr(item, id_column.key))
+
+    next_cursor = prev_cursor = None
+    if items:
+        if has_older:
+            next_cursor = cursor(items[-1])
+        if has_newer:
+            prev_cursor = cursor(items[0])
+    return KeysetPage(items, next_cursor, prev_cursor)
+
+
+def table_row_estimate(table_name):
+    """Row count estimate from MySQL table statistics, or None on other databases."""
+    if db.engine.dialect.name != 'mysql':
+        return None
+    return db.session.execute(db.text(
+        "SELECT TABLE_ROWS FROM information_schema.TABLES "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table"
+    ), {'table': table_name}).scalar()
+
+
+def approximate_count(query, cache_key, filtered=True, ttl=None):
+    """Total rows for a listing, cached so repeat visits skip the COUNT(*).
+
+    An unfiltered listing on MySQL uses the table statistics estimate. A
+    filtered one runs a real COUNT(*) at most once per ttl for each set of
+    filters, so the figure can trail recent writes.
+    """
+    def compute():
+        if not filtered:
+            estimate = table_row_estimate(query.column_descriptions[0]['entity'].__tablename__)
+            if estimate is not None:
+                return int(estimate)
+        return query.order_by(None).count()
+
+    return count_cache.get_or_set(cache_key, compute, ttl)
@@ -0,0 +1,235 @@
+import random
+import re
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from models import db, User, Transaction, Budget, Payroll, AuditLog, Department, DailyLedgerRollup, Notification
+from finance_aggregates import (
+    budget_spend_query, payroll_history_query, type_totals_query, add_months, month_start as first_of_month
+)
+from ledger_queries import (
+    recent_transactions_query, pending_transactions_query, upcoming_payments_query,
+    department_expenses_query, department_transactions_query, filtered_transactions,
+    transaction_export_query, transaction_audit_query, upcoming_payroll_query, pending_payroll_query,
+    payroll_month_query, employee_payroll_month_query, payroll_export_query, audit_log_export_query
+)
+from bulk_approval import candidates_query
+from notification_store import unread_query
+from audit_retention import oldest_entry_query
+from pagination import keyset_query, encode_cursor
+from ledger_rollup import rebuild_rollup
+
+# SQLite reports a full table scan as a bare "SCAN <table>" step
+SQLITE_FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+# Queries that read every row of a small lookup table by design
+WHOLE_TABLE_READS = {
+    'budget spend: categories': {'budgets'},
+}
+
+# Default page size of the transactions listing
+TRANSACTIONS_PER_PAGE = 10
+
+PLAN_CATEGORIES = ('Salaries', 'Rent', 'Utilities', 'Travel', 'Supplies', 'Software',
+                   'Marketing', 'Training', 'Food', 'Equipment', 'Insurance', 'General')
+
+
+def seed_plan_fixture(transactions=20000, departments=10, users=100, months=24, seed=0):
+    """Fill an empty database with ledger-shaped data so EXPLAIN sees realistic tables.
+
+    Rows are spread over the last `months` months across departments,
+    categories, types and statuses the way production data is, then the
+    rollup is rebuilt and table statistics refreshed. Run it only against a
+    scratch database; it commits.
+    """
+    if db.session.query(Transaction.id).first() is not None:
+        raise RuntimeError('seed_plan_fixture needs an empty database')
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    start = now - timedelta(days=30 * months)
+    span = int((now - start).total_seconds())
+
+    def moment():
+        return start + timedelta(seconds=rng.randrange(span))
+
+    db.session.execute(Department.__table__.insert(), [
+        {'name': f'Department {i}', 'budget_limit': 50000, 'created_at': start} for i in range(departments)
+    ])
+    db.session.execute(Budget.__table__.insert(), [
+        {'category': category, 'budget_amount': 100000} for category in PLAN_CATEGORIES
+    ])
+    department_ids = [department_id for department_id, in db.session.query(Department.id)]
+    db.session.execute(User.__table__.insert(), [{
+        'username': f'plan-user-{i}',
+        'email': f'plan-user-{i}@example.com',
+        'password_hash': '!',
+        'role': rng.choice(('employee', 'employee', 'employee', 'manager', 'finance')),
+        'department_id': rng.choice(department_ids),
+        'is_active': True,
+        'created_at': start
+    } for i in range(users)])
+    user_ids = [user_id for user_id, in db.session.query(User.id)]
+
+    db.session.execute(Transaction.__table__.insert(), [{
+        'type': rng.choice(('expense', 'expense', 'income')),
+        'amount': rng.randrange(100, 500000) / 100,
+        'description': f'plan row {i}',
+        'date': moment(),
+        'category': rng.choice(PLAN_CATEGORIES),
+        'status': rng.choice(('approved', 'approved', 'approved', 'pending', 'rejected')),
+        'creator_id': rng.choice(user_ids),
+        'department_id': rng.choice(department_ids)
+    } for i in range(transactions)])
+
+    current = first_of_month(now)
+    db.session.execute(Payroll.__table__.insert(), [{
+        'employee_id': user_id,
+        'salary_amount': rng.randrange(300000, 1500000) / 100,
+        'payment_date': (add_months(current, -offset) + timedelta(days=24)).date(),
+        'status': 'paid' if offset else 'pending',
+        'created_at': add_months(current, -offset)
+    } for user_id in user_ids for offset in range(months)])
+
+    db.session.execute(AuditLog.__table__.insert(), [{
+        'user_id': rng.choice(user_ids),
+        'action': rng.choice(('LOGIN_SUCCESS', 'TRANSACTION_CREATED', 'TRANSACTION_UPDATED', 'LOGOUT')),
+        'resource_type': rng.choice(('login', 'transaction', 'transaction', 'budget')),
+        'resource_id': str(rng.randrange(1, transactions + 1)),
+        'timestamp': moment()
+    } for _ in range(transactions)])
+
+    db.session.execute(Notification.__table__.insert(), [{
+        'user_id': user_id,
+        'key': f'budget:{category}:warning:{i}',
+        'type': 'warning',
+        'message': f'{category} budget at 80%',
+        'is_read': i % 3 != 0,
+        'created_at': moment()
+    } for user_id in user_ids for i, category in enumerate(PLAN_CATEGORIES)])
+
+    rebuild_rollup()
+    db.session.commit()
+
+    # Let the planner see the new row counts
+    if db.engine.dialect.name == 'mysql':
+        tables = ', '.join(model.__tablename__ for model in (
+            Department, Budget, User, Transaction, Payroll, AuditLog, Notification, DailyLedgerRollup))
+        db.session.execute(db.text(f'ANALYZE TABLE {tables}'))
+    else:
+        db.session.execute(db.text('ANALYZE'))
+    db.session.commit()
+
+
+def route_queries():
+    """The main queries of the ledger routes, keyed by route and purpose.
+
+    Every entry comes from the builder the route itself calls, so the plans
+    checked here are the plans those routes get. Sample ids come from the
+    database.
+    """
+    now = datetime.utcnow()
+    month_start = first_of_month(now)
+    department = Department.query.first()
+    department_id = department.id if department else 1
+    employee_ids = [user_id for user_id, in db.session.query(User.id).filter_by(department_id=department_id)]
+    payroll = Payroll.query.first()
+    employee_id = payroll.employee_id if payroll else 1
+    user = User.query.first()
+    user_id = user.id if user else 1
+    admin = User(role='admin')
+    cursor_row = Transaction.query.order_by(Transaction.date.desc()).offset(50).first()
+    cursor = encode_cursor(*((cursor_row.date, cursor_row.id) if cursor_row else (now, 1)))
+    listing = filtered_transactions({'department_id': str(department_id)}, admin)
+    export_filters = {'start_date': f'{month_start:%Y-%m-%d}', 'end_date': f'{now:%Y-%m-%d}'}
+
+    def transactions_page(**cursors):
+        return keyset_query(listing, Transaction.date, Transaction.id, TRANSACTIONS_PER_PAGE, **cursors)
+
+    return [
+        ('dashboard: recent transactions',
+         recent_transactions_query()),
+        ('dashboard: pending approvals',
+         pending_transactions_query()),
+        ('dashboard: upcoming payroll',
+         upcoming_payroll_query(now, status='pending').limit(5)),
+        ('dashboard-data: period totals',
+         type_totals_query(now - timedelta(days=30), now)),
+        ('dashboard-data: recent transactions',
+         recent_transactions_query(now - timedelta(days=30), now)),
+        ('dashboard-data: next payroll',
+         upcoming_payroll_query(now).limit(1)),
+        ('financial-alerts: upcoming payroll',
+         upcoming_payroll_query(now, now + timedelta(days=7), status='pending')),
+        ('real-time-alerts: upcoming payments',
+         upcoming_payments_query(now + timedelta(days=7))),
+        ('manager dashboard: pending transactions',
+         pending_transactions_query(department_id)),
+        ('manager dashboard: monthly expenses',
+         department_expenses_query(department_id, month_start)),
+        ('manager dashboard: pending payroll',
+         pending_payroll_query(employee_ids)),
+        ('department transactions',
+         department_transactions_query(department_id)),
+        ('transactions list: first page',
+         transactions_page()),
+        ('transactions list: older page',
+         transactions_page(after=cursor)),
+        ('transactions list: newer page',
+         transactions_page(before=cursor)),
+        ('budget spend: categories',
+         budget_spend_query(month_start, None, status='approved')),
+        ('payroll overview: current month',
+         payroll_month_query(month_start)),
+        ('payroll history',
+         payroll_history_query(add_months(month_start, -5), add_months(month_start, 1))),
+        ('add payroll: existing record',
+         employee_payroll_month_query(employee_id, now)),
+        ('bulk approval: ids',
+         candidates_query(ids=[1, 2, 3])),
+        ('bulk approval: department filter',
+         candidates_query(filters={'start_date': month_start}, department_ids=[department_id])),
+        ('transactions export: date range',
+         transaction_export_query(export_filters, admin)),
+        ('payroll export: date range',
+         payroll_export_query(month_start, now)),
+        ('audit log export: date range',
+         audit_log_export_query(month_start, now)),
+        ('notifications: unread',
+         unread_query(user_id)),
+        ('transaction audit trail',
+         transaction_audit_query(1)),
+        ('audit retention: oldest entry',
+         oldest_entry_query(month_start)),
+    ]
+
+
+def explain(query):
+    """Run EXPLAIN for a query and return the tables it reads with a full scan.
+
+    The statement goes through the normal execute path, so bind processors
+    (Money cents, dates) and expanding IN lists are applied exactly as for
+    the real query; a cursor hook only prefixes the SQL with EXPLAIN.
+    """
+    dialect_name = db.engine.dialect.name
+    keyword = 'EXPLAIN QUERY PLAN' if dialect_name == 'sqlite' else 'EXPLAIN'
+
+    def prefix(conn, cursor, statement, parameters, context, executemany):
+        return f'{keyword} {statement}', parameters
+
+    connection = db.session.connection()
+    event.listen(connection, 'before_cursor_execute', prefix, retval=True)
+    try:
+        cursor = connection.execute(query.statement).cursor
+        columns = [column[0] for column in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    finally:
+        event.remove(connection, 'before_cursor_execute', prefix)
+
+    if dialect_name == 'sqlite':
+        return [match.group(1) for match in (SQLITE_FULL_SCAN.match(row['detail']) for row in rows) if match]
+    return [row['table'] for row in rows if row['type'] == 'ALL']
+
+
+def full_scans(name, query):
+    """Tables query reads in full, leaving out the lookup tables it is meant to read whole."""
+    return [table for table in explain(query) if table not in WHOLE_TABLE_READS.get(name, ())]
@@ -0,0 +1,161 @@
+import re
+import threading
+import time
+from collections import Counter
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Expanded IN lists and VALUES rows collapse to one placeholder, so the
+# same statement with a different number of ids still has one shape
+PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:\?|%s|:\w+)\s*,)+\s*(?:\?|%s|:\w+)\s*\)')
+WHITESPACE = re.compile(r'\s+')
+
+
+def statement_shape(statement):
+    """Normalize a SQL statement so repeats of one query compare equal."""
+    return WHITESPACE.sub(' ', PLACEHOLDER_LIST.sub('(?)', statement)).strip()
+
+
+class RequestProfile:
+    """SQL statements issued while handling one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.slowest_statement = None
+        self.shapes = Counter()
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.slowest:
+            self.slowest = elapsed
+            self.slowest_statement = statement
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold):
+        """Statement shapes issued more than threshold times, most frequent first."""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+
+class EndpointStats:
+    """Running totals of RequestProfile results for one endpoint."""
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.db_time = 0.0
+        self.slowest = 0.0
+        self.slowest_statement = None
+        self.n_plus_one = 0
+        self.repeated_statement = None
+
+    def add(self, profile, repeated):
+        self.requests += 1
+        self.queries += profile.count
+        self.max_queries = max(self.max_queries, profile.count)
+        self.db_time += profile.total
+        if profile.slowest > self.slowest:
+            self.slowest = profile.slowest
+            self.slowest_statement = profile.slowest_statement
+        if repeated:
+            self.n_plus_one += 1
+            self.repeated_statement = repeated[0][0]
+
+    def to_dict(self):
+        return {
+            'requests': self.requests,
+            'avg_queries': self.queries / self.requests if self.requests else 0,
+            'max_queries': self.max_queries,
+            'avg_db_ms': self.db_time * 1000 / self.requests if self.requests else 0,
+            'slowest_ms': self.slowest * 1000,
+            'slowest_statement': self.slowest_statement,
+            'n_plus_one_requests': self.n_plus_one,
+            'repeated_statement': self.repeated_statement
+        }
+
+
+class QueryProfiler:
+    """Counts and times the SQL each request issues.
+
+    Cursor execute events are recorded into a RequestProfile on flask.g, so
+    statements from background threads are ignored. After each request the
+    profile is folded into per-endpoint totals; in debug (or with
+    QUERY_PROFILER_HEADERS) it is also reported in X-DB-* response headers.
+    A statement shape repeated more than repeat_threshold times in one
+    request is counted as an N+1 pattern.
+    """
+
+    def __init__(self, repeat_threshold=5):
+        self.repeat_threshold = repeat_threshold
+        self.headers = False
+        self.app = None
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.repeat_threshold = app.config.get('QUERY_PROFILER_REPEAT_THRESHOLD', self.repeat_threshold)
+        self.headers = app.config.get('QUERY_PROFILER_HEADERS', app.debug)
+        app.extensions['query_profiler'] = self
+        if not app.config.get('QUERY_PROFILER_ENABLED', True):
+            return
+
+        if not event.contains(Engine, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            event.listen(Engine, 'handle_error', self._handle_error)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def _start(self):
+        g.query_profile = RequestProfile()
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'query_profile' in g:
+            conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('query_start')
+        if starts and has_request_context() and 'query_profile' in g:
+            g.query_profile.record(statement, time.perf_counter() - starts.pop())
+
+    def _handle_error(self, exception_context):
+        # A failed statement gets no after_cursor_execute; drop its start time
+        connection = exception_context.connection
+        if connection is not None and connection.info.get('query_start'):
+            connection.info['query_start'].pop()
+
+    def _finish(self, response):
+        profile = g.pop('query_profile', None)
+        if profile is None:
+            return response
+
+        repeated = profile.repeated(self.repeat_threshold)
+        endpoint = request.endpoint or 'unmatched'
+        with self._lock:
+            self._stats.setdefault(endpoint, EndpointStats()).add(profile, repeated)
+
+        if self.headers:
+            response.headers['X-DB-Query-Count'] = str(profile.count)
+            response.headers['X-DB-Time-Ms'] = f'{profile.total * 1000:.2f}'
+            response.headers['X-DB-Slowest-Ms'] = f'{profile.slowest * 1000:.2f}'
+            if repeated:
+                response.headers['X-DB-Repeated-Statements'] = str(len(repeated))
+        return response
+
+    def stats(self):
+        """Per-endpoint totals, heaviest total database time first."""
+        with self._lock:
+            rows = [(endpoint, stats.to_dict()) for endpoint, stats in self._stats.items()]
+        return sorted(rows, key=lambda row: row[1]['avg_db_ms'] * row[1]['requests'], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+query_profiler = QueryProfiler()
@@ -1,5 +1,5 @@
 from datetime import datetime, timedelta
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, session, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, session, jsonify, Response, stream_with_context, abort
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from models import User, Transaction, Budget, AuditLog, db, Department, Payroll
@@ -8,6 +8,37 @@ from wtforms import StringField, PasswordField, SelectField, FloatField, TextAre
 from forms import LoginForm, TransactionForm, UserRegistrationForm, UserEditForm, ResetPasswordRequestForm, ResetPasswordForm
 from utils import validate_password, admin_required, hr_required, finance_required, roles_required
 from extensions import limiter
+from finance_aggregates import (
+    GRANULARITIES, BUDGET_PERIODS, PAYROLL_HISTORY_MONTHS, month_start, add_months, type_totals, period_summary, category_totals, time_series,
+    evaluate_budgets, budget_spend, period_bounds, payroll_history,
+    FINANCIAL_ALERT_THRESHOLDS, REAL_TIME_ALERT_THRESHOLDS
+)
+from ledger_rollup import ledger_entry, record_transaction, move_transaction
+from notification_store import (
+    refresh_budget_notifications, ensure_notifications, unread_notifications, unread_query, mark_read,
+    notification_etag
+)
+from ledger_version import bump_ledger_version, conditional_on_ledger_version, conditional_on_etag
+from event_hub import hub, format_sse, publish_transaction, transaction_event_data, ALL_DEPARTMENT_ROLES
+from pagination import keyset_page, approximate_count, count_cache, InvalidCursor
+from ledger_queries import (
+    recent_transactions_query, pending_transactions_query, upcoming_payments_query,
+    department_expenses_query, department_transactions_query, filtered_transactions,
+    transaction_export_query, transaction_audit_query, upcoming_payroll_query, pending_payroll_query,
+    payroll_month_query, employee_payroll_month_query, payroll_export_query, audit_log_export_query
+)
+from user_cache import user_cache, bump_user_version, invalidate_user
+from audit_sink import audit_sink
+from exports import (
+    TRANSACTION_EXPORT_COLUMNS, BUDGET_EXPORT_COLUMNS, PAYROLL_EXPORT_COLUMNS, AUDIT_LOG_EXPORT_COLUMNS,
+    available_formats, stream_query, export_response
+)
+from bulk_approval import BULK_ACTIONS, BULK_APPROVAL_MAX, bulk_review
+from serializers import serialize
+from query_profiler import query_profiler
+from db_pool import pool_stats
+from transaction_import import IMPORT_FORMATS, read_csv, read_ofx, import_transactions
+import io
 import json
 from urllib.parse import urlparse
 from functools import wraps
@@ -15,6 +46,9 @@ from functools import wraps
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 main_bp = Blueprint('main', __name__)
 
+# Roles notified about payroll changes on the dashboard stream
+PAYROLL_EVENT_ROLES = ('admin', 'finance', 'hr', 'accountant')
+
 @main_bp.route('/')
 def index():
     if current_user.is_authenticated:
@@ -34,49 +68,29 @@ def dashboard():
         'expense_trend': 0.0
     }
     
-    # Calculate KPIs
-    current_month = datetime.now().replace(day=1)
-    transactions = Transaction.query.filter(Transaction.date >= current_month).all()
-    
-    for transaction in transactions:
-        if transaction.type == 'income':
-            kpis['total_income'] += transaction.amount
-        else:
-            kpis['total_expenses'] += transaction.amount
-    
-    kpis['net_balance'] = kpis['total_income'] - kpis['total_expenses']
-    
-    # Get trend data (comparing to last month)
-    last_month = current_month.replace(month=current_month.month-1 if current_month.month > 1 else 12)
-    last_month_transactions = Transaction.query.filter(
-        Transaction.date >= last_month,
-        Transaction.date < current_month
-    ).all()
+    # Calculate KPIs for this month, with trends against last month
+    current_month = month_start(datetime.now())
+    last_month = add_months(current_month, -1)
+    summary = period_summary(current_month, None, last_month, current_month)
     
-    last_month_income = sum(t.amount for t in last_month_transactions if t.type == 'income')
-    last_month_expenses = sum(t.amount for t in last_month_transactions if t.type == 'expense')
-    
-    # Calculate trends (percentage change)
-    if last_month_income > 0:
-        kpis['income_trend'] = ((kpis['total_income'] - last_month_income) / last_month_income * 100)
-    if last_month_expenses > 0:
-        kpis['expense_trend'] = ((kpis['total_expenses'] - last_month_expenses) / last_month_expenses * 100)
+    kpis['total_income'] = summary['income']
+    kpis['total_expenses'] = summary['expenses']
+    kpis['net_balance'] = summary['net']
+    kpis['income_trend'] = summary['income_change']
+    kpis['expense_trend'] = summary['expense_change']
     
     # Get recent transactions
-    recent_transactions = Transaction.query.order_by(Transaction.date.desc()).limit(5).all()
+    recent_transactions = recent_transactions_query().all()
     
     # Get pending approvals
     pending_approvals = []
     if current_user.role in ['admin', 'manager']:
-        pending_approvals = Transaction.query.filter_by(status='pending').all()
+        pending_approvals = pending_transactions_query().all()
     
     # Get upcoming payroll
     upcoming_payroll = []
     if current_user.role in ['admin', 'hr', 'manager']:
-        upcoming_payroll = Payroll.query.filter(
-            Payroll.payment_date > datetime.now(),
-            Payroll.status == 'pending'
-        ).order_by(Payroll.payment_date).limit(5).all()
+        upcoming_payroll = upcoming_payroll_query(datetime.now(), status='pending').limit(5).all()
     
     return render_template('dashboard.html',
                          kpis=kpis,
@@ -111,10 +125,10 @@ def login():
                 audit_log = AuditLog(
                     user_id=user.id,
                     action='LOGIN_SUCCESS',
-                    endpoint='auth.login',
                     ip_address=request.remote_addr,
                     timestamp=datetime.utcnow(),
                     details=json.dumps({
+                        'endpoint': 'auth.login',
                         'username': user.username,
                         'role': user.role,
                         'remember_me': form.remember_me.data
@@ -122,8 +136,7 @@ def login():
                     resource_type='login',
                     resource_id=None
                 )
-                db.session.add(audit_log)
-                db.session.commit()
+                audit_sink.enqueue(audit_log)
 
                 next_page = request.args.get('next')
                 if not next_page or urlparse(next_page).netloc != '':
@@ -135,10 +148,10 @@ def login():
                     audit_log = AuditLog(
                         user_id=user.id,
                         action='LOGIN_FAILED',
-                        endpoint='auth.login',
                         ip_address=request.remote_addr,
                         timestamp=datetime.utcnow(),
                         details=json.dumps({
+                            'endpoint': 'auth.login',
                             'reason': 'Invalid password',
                             'username': user.username
                         }),
@@ -149,18 +162,17 @@ def login():
                     audit_log = AuditLog(
                         user_id=None,
                         action='LOGIN_FAILED',
-                        endpoint='auth.login',
                         ip_address=request.remote_addr,
                         timestamp=datetime.utcnow(),
                         details=json.dumps({
+                            'endpoint': 'auth.login',
                             'reason': 'User not found',
                             'attempted_username': form.username.data
                         }),
                         resource_type='login',
                         resource_id=None
                     )
-                db.session.add(audit_log)
-                db.session.commit()
+                audit_sink.enqueue(audit_log)
                 
                 flash('Invalid username or password', 'error')
         except Exception as e:
@@ -182,17 +194,16 @@ def logout():
     audit_log = AuditLog(
         user_id=current_user.id,
         action='LOGOUT',
-        endpoint='auth.logout',
         ip_address=request.remote_addr,
         timestamp=datetime.utcnow(),
         details=json.dumps({
+            'endpoint': 'auth.logout',
             'username': current_user.username
         }),
         resource_type='logout',
         resource_id=None
     )
-    db.session.add(audit_log)
-    db.session.commit()
+    audit_sink.enqueue(audit_log)
     
     logout_user()
     flash('You have been logged out.', 'info')
@@ -239,8 +250,7 @@ def register():
                 }),
                 ip_address=request.remote_addr
             )
-            db.session.add(audit_log)
-            db.session.commit()
+            audit_sink.enqueue(audit_log)
             
             flash('Default admin and finance users created successfully.', 'success')
             return redirect(url_for('auth.login'))
@@ -264,10 +274,10 @@ def register():
             audit_log = AuditLog(
                 user_id=current_user.id,
                 action='USER_CREATED',
-                endpoint='auth.register',
                 ip_address=request.remote_addr,
                 timestamp=datetime.utcnow(),
                 details=json.dumps({
+                    'endpoint': 'auth.register',
                     'created_username': new_user.username,
                     'created_role': new_user.role,
                     'created_by': current_user.username
@@ -275,7 +285,7 @@ def register():
                 resource_type='users',
                 resource_id=str(new_user.id)
             )
-            db.session.add(audit_log)
+            audit_sink.enqueue_on_commit(audit_log)
             db.session.commit()
             
             flash('User created successfully!', 'success')
@@ -287,10 +297,10 @@ def register():
         error_log = AuditLog(
             user_id=current_user.id,
             action='USER_CREATION_ERROR',
-            endpoint='auth.register',
             ip_address=request.remote_addr,
             timestamp=datetime.utcnow(),
             details=json.dumps({
+                'endpoint': 'auth.register',
                 'error': str(e),
                 'attempted_username': form.username.data if form.username.data else None,
                 'created_by': current_user.username
@@ -298,8 +308,7 @@ def register():
             resource_type='users',
             resource_id=None
         )
-        db.session.add(error_log)
-        db.session.commit()
+        audit_sink.enqueue(error_log)
         
         print(f"Error in register route: {str(e)}")
         flash('Error creating user. Please try again.', 'error')
@@ -351,6 +360,9 @@ def add_transaction():
                 print(f"Transaction object: {transaction.to_dict()}")
                 
                 db.session.add(transaction)
+                record_transaction(transaction)
+                refresh_budget_notifications()
+                bump_ledger_version()
                 
                 # Update budget tracking
                 budget = Budget.query.filter_by(category=transaction.category).first()
@@ -363,10 +375,10 @@ def add_transaction():
                 audit_log = AuditLog(
                     user_id=current_user.id,
                     action='TRANSACTION_CREATED',
-                    endpoint='auth.add_transaction',
                     ip_address=request.remote_addr,
                     timestamp=datetime.utcnow(),
                     details=json.dumps({
+                        'endpoint': 'auth.add_transaction',
                         'transaction_type': transaction.type,
                         'amount': float(transaction.amount),
                         'category': transaction.category,
@@ -376,10 +388,11 @@ def add_transaction():
                     resource_type='transaction',
                     resource_id=None
                 )
-                db.session.add(audit_log)
+                audit_sink.enqueue_on_commit(audit_log)
                 
                 try:
                     db.session.commit()
+                    publish_transaction('transaction.created', transaction)
                     flash('Transaction added successfully!', 'success')
                     return redirect(url_for('auth.transactions'))
                 except Exception as e:
@@ -398,18 +411,17 @@ def add_transaction():
         error_log = AuditLog(
             user_id=current_user.id,
             action='TRANSACTION_CREATION_ERROR',
-            endpoint='auth.add_transaction',
             ip_address=request.remote_addr,
             timestamp=datetime.utcnow(),
             details=json.dumps({
+                'endpoint': 'auth.add_transaction',
                 'error': str(e),
                 'created_by': current_user.username
             }),
             resource_type='transaction',
             resource_id=None
         )
-        db.session.add(error_log)
-        db.session.commit()
+        audit_sink.enqueue(error_log)
         
         print(f"Error adding transaction: {str(e)}")
         
@@ -420,9 +432,13 @@ def add_transaction():
 
 @auth_bp.route('/api/dashboard-data')
 @login_required
+@conditional_on_ledger_version
 def get_dashboard_data():
     try:
         time_range = request.args.get('timeRange', 'month')
+        granularity = request.args.get('granularity', 'day')
+        if granularity not in GRANULARITIES:
+            granularity = 'day'
         
         # Calculate date range
         end_date = datetime.utcnow()
@@ -437,35 +453,25 @@ def get_dashboard_data():
         else:  # year
             start_date = end_date - timedelta(days=365)
 
-        # Get transactions for the period
-        transactions = Transaction.query.filter(
-            Transaction.date.between(start_date, end_date)
-        ).all()
-
-        # Calculate totals
-        income = sum(t.amount for t in transactions if t.type == 'income')
-        expenses = sum(t.amount for t in transactions if t.type == 'expense')
-        net = income - expenses
-
-        # Calculate trends (compared to previous period)
-        prev_start = start_date - (end_date - start_date)
-        prev_transactions = Transaction.query.filter(
-            Transaction.date.between(prev_start, start_date)
-        ).all()
-        prev_income = sum(t.amount for t in prev_transactions if t.type == 'income')
-        prev_expenses = sum(t.amount for t in prev_transactions if t.type == 'expense')
-        
-        # Calculate percentage changes
-        income_change = ((income - prev_income) / prev_income * 100) if prev_income > 0 else 0
-        expense_change = ((expenses - prev_expenses) / prev_expenses * 100) if prev_expenses > 0 else 0
-        net_change = income_change - expense_change
+        # Totals and trends (compared to previous period), read from the daily
+        # ledger rollup; both windows cover the same number of whole days
+        start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        period_end = end_date.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        prev_start = start_date - (period_end - start_date)
+        summary = period_summary(start_date, period_end, prev_start)
+        income = summary['income']
+        expenses = summary['expenses']
+        net = summary['net']
+        income_change = summary['income_change']
+        expense_change = summary['expense_change']
+        net_change = summary['net_change']
 
         # Get category-wise budget data
+        category_spent = category_totals(start_date, end_date)
         budgets = Budget.query.all()
         budget_data = []
         for budget in budgets:
-            spent = sum(t.amount for t in transactions 
-                       if t.type == 'expense' and t.category == budget.category)
+            spent = category_spent.get(budget.category, 0)
             budget_data.append({
                 'category': budget.category,
                 'budget': budget.budget_amount,
@@ -475,19 +481,10 @@ def get_dashboard_data():
             })
 
         # Get recent transactions
-        recent_transactions = [t.to_dict() for t in transactions[-5:]]
-
-        # Prepare chart data
-        dates = []
-        daily_income = []
-        daily_expenses = []
-        current = start_date
-        while current <= end_date:
-            dates.append(current.strftime('%Y-%m-%d'))
-            day_transactions = [t for t in transactions if t.date.date() == current.date()]
-            daily_income.append(sum(t.amount for t in day_transactions if t.type == 'income'))
-            daily_expenses.append(sum(t.amount for t in day_transactions if t.type == 'expense'))
-            current += timedelta(days=1)
+        recent_transactions = serialize(recent_transactions_query(start_date, end_date))
+
+        # Prepare chart data, one point per day/week/month
+        chart_data = time_series(start_date, end_date, granularity)
 
         response_data = {
             'total_income': income,
@@ -500,18 +497,12 @@ def get_dashboard_data():
             },
             'budget_overview': budget_data,
             'recent_transactions': recent_transactions,
-            'chart_data': {
-                'labels': dates,
-                'income': daily_income,
-                'expenses': daily_expenses
-            }
+            'chart_data': chart_data
         }
 
         # Add payroll status for admin/accountant
         if current_user.role in ['admin', 'accountant']:
-            upcoming_payroll = Payroll.query.filter(
-                Payroll.payment_date > datetime.utcnow()
-            ).order_by(Payroll.payment_date).first()
+            upcoming_payroll = upcoming_payroll_query(datetime.utcnow()).first()
             
             if upcoming_payroll:
                 response_data['payroll'] = {
@@ -527,54 +518,109 @@ def get_dashboard_data():
         error_log = AuditLog(
             user_id=current_user.id,
             action='DASHBOARD_DATA_ERROR',
-            endpoint='auth.get_dashboard_data',
             ip_address=request.remote_addr,
             timestamp=datetime.utcnow(),
             details=json.dumps({
+                'endpoint': 'auth.get_dashboard_data',
                 'error': str(e),
                 'time_range': time_range
             }),
             resource_type='dashboard',
             resource_id=None
         )
-        db.session.add(error_log)
-        db.session.commit()
+        audit_sink.enqueue(error_log)
         
         return jsonify({'error': 'Failed to fetch dashboard data'}), 500
 
+def dashboard_kpis(department_id=None):
+    """Month-to-date KPIs in the shape the dashboard script expects"""
+    current_month = month_start(datetime.now())
+    summary = period_summary(current_month, None, add_months(current_month, -1), current_month,
+                             department_id=department_id)
+    return {
+        'total_income': summary['income'],
+        'total_expenses': summary['expenses'],
+        'net_balance': summary['net'],
+        'changes': {
+            'income': summary['income_change'],
+            'expenses': summary['expense_change'],
+            'profit': summary['net_change']
+        }
+    }
+
+@auth_bp.route('/api/dashboard-stream')
+@login_required
+def dashboard_stream():
+    """Push KPI updates to the dashboard as ledger, budget and payroll data changes"""
+    # Users outside the finance roles only see their own department; without
+    # one there is nothing they may see, and None would mean every department
+    user_id, role, user_department_id = current_user.id, current_user.role, current_user.department_id
+    if role in ALL_DEPARTMENT_ROLES:
+        department_id = None
+    elif user_department_id is None:
+        abort(403)
+    else:
+        department_id = user_department_id
+    heartbeat = current_app.config.get('SSE_HEARTBEAT_SECONDS', 15)
+    max_duration = current_app.config.get('SSE_MAX_STREAM_SECONDS', 300)
+    
+    def generate():
+        # Subscribe only once the body is being sent, so a response that is
+        # never iterated cannot hold a connection slot
+        subscription = hub.subscribe(user_id, role, user_department_id)
+        if subscription is None:
+            # Every open stream ends within max_duration, so retry after that
+            yield f'retry: {max_duration * 1000}\n\n'
+            yield format_sse({'error': 'Too many open dashboard streams'}, event='busy')
+            return
+        try:
+            yield f'retry: {heartbeat * 1000}\n\n'
+            yield format_sse({'kpis': dashboard_kpis(department_id), 'events': []})
+            db.session.remove()
+            for events in hub.listen(subscription, heartbeat, max_duration):
+                if events is None:
+                    yield ': heartbeat\n\n'
+                    continue
+                yield format_sse({
+                    'kpis': dashboard_kpis(department_id),
+                    'events': [{'event': e['event'], **e['data']} for e in events]
+                })
+                # Release the pooled connection while the stream is idle
+                db.session.remove()
+        finally:
+            hub.unsubscribe(subscription)
+    
+    return Response(stream_with_context(generate()),
+                     mimetype='text/event-stream',
+                     headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @auth_bp.route('/api/financial-alerts')
 @login_required
 @limiter.limit("60 per minute")  # Rate limiting for API endpoints
+@conditional_on_ledger_version
 def get_financial_alerts():
     """Get financial alerts"""
     alerts = []
     
-    # Check budget overruns
-    budgets = Budget.query.all()
-    for budget in budgets:
-        spent = sum(t.amount for t in Transaction.query.filter_by(
-            category=budget.category,
-            type='expense'
-        ).filter(Transaction.date >= datetime.now() - timedelta(days=30)).all())
-        if spent > budget.budget_amount:
+    # Check budget overruns over the last 30 days
+    thirty_days_ago = datetime.now() - timedelta(days=30)
+    for budget in evaluate_budgets(FINANCIAL_ALERT_THRESHOLDS, thirty_days_ago):
+        if budget['level'] == 'warning':
             alerts.append({
                 'type': 'warning',
-                'message': f'Budget exceeded for {budget.category}',
-                'details': f'Spent ${spent:.2f} of ${budget.budget_amount:.2f} budget'
+                'message': f'Budget exceeded for {budget["category"]}',
+                'details': f'Spent ${budget["spent"]:.2f} of ${budget["budget_amount"]:.2f} budget'
             })
-        elif spent > (budget.budget_amount * 0.8):
+        else:
             alerts.append({
                 'type': 'info',
-                'message': f'Budget threshold reached for {budget.category}',
-                'details': f'Used {(spent/budget.budget_amount*100):.1f}% of budget'
+                'message': f'Budget threshold reached for {budget["category"]}',
+                'details': f'Used {budget["utilization"]:.1f}% of budget'
             })
     
     # Check upcoming payroll
-    upcoming_payroll = Payroll.query.filter(
-        Payroll.payment_date > datetime.now(),
-        Payroll.payment_date <= datetime.now() + timedelta(days=7),
-        Payroll.status == 'pending'
-    ).all()
+    now = datetime.now()
+    upcoming_payroll = upcoming_payroll_query(now, now + timedelta(days=7), status='pending').all()
     
     for payroll in upcoming_payroll:
         alerts.append({
@@ -588,33 +634,21 @@ def get_financial_alerts():
 @auth_bp.route('/api/real-time-alerts')
 @login_required
 @limiter.limit("60 per minute")  # Rate limiting for API endpoints
+@conditional_on_ledger_version
 def get_real_time_alerts():
     """Get real-time financial alerts for the user"""
     alerts = []
     
-    # Check for budget overruns
-    budgets = Budget.query.all()
-    for budget in budgets:
-        total_expenses = db.session.query(db.func.sum(Transaction.amount))\
-            .filter(Transaction.type == 'expense',
-                   Transaction.category == budget.category)\
-            .scalar() or 0
-        
-        if total_expenses >= budget.budget_amount * 0.9:  # 90% of budget
-            alert_type = 'danger' if total_expenses >= budget.budget_amount else 'warning'
-            alerts.append({
-                'type': alert_type,
-                'message': f'Budget Alert: {budget.category}',
-                'details': f'You have used {(total_expenses/budget.budget_amount)*100:.1f}% of your {budget.category} budget'
-            })
+    # Check for budget overruns (all-time spend); reaching 90% or 100% counts
+    for budget in evaluate_budgets(REAL_TIME_ALERT_THRESHOLDS, inclusive=True):
+        alerts.append({
+            'type': budget['level'],
+            'message': f'Budget Alert: {budget["category"]}',
+            'details': f'You have used {budget["utilization"]:.1f}% of your {budget["category"]} budget'
+        })
     
     # Check for upcoming payments (within next 7 days)
-    upcoming_date = datetime.utcnow() + timedelta(days=7)
-    upcoming_payments = Transaction.query\
-        .filter(Transaction.type == 'expense',
-               Transaction.date <= upcoming_date,
-               Transaction.status == 'pending')\
-        .all()
+    upcoming_payments = upcoming_payments_query(datetime.utcnow() + timedelta(days=7)).all()
     
     for payment in upcoming_payments:
         alerts.append({
@@ -628,50 +662,17 @@ def get_real_time_alerts():
 @auth_bp.route('/api/notifications')
 @login_required
 @limiter.limit("60 per minute")  # Rate limiting for API endpoints
+@conditional_on_etag(notification_etag)
 def get_notifications():
     """Get unread notifications and alerts"""
-    unread_count = 0
-    alerts = []
-    
-    # Get all transactions from the last 30 days
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    transactions = Transaction.query.filter(Transaction.date >= thirty_days_ago).all()
-    
-    # Get all budgets
-    budgets = Budget.query.all()
-    
-    # Calculate monthly spending for each budget category
-    budget_spending = {}
-    for transaction in transactions:
-        if transaction.type == 'expense':
-            if transaction.category not in budget_spending:
-                budget_spending[transaction.category] = 0
-            budget_spending[transaction.category] += transaction.amount
-    
-    # Check each budget category for alerts
-    for budget in budgets:
-        monthly_spent = budget_spending.get(budget.category, 0)
-        
-        # Alert if spending is over 80% of budget
-        if monthly_spent > budget.budget_amount * 0.8:
-            alerts.append({
-                'type': 'warning',
-                'message': f'Budget alert for {budget.category}',
-                'details': f'Used {(monthly_spent/budget.budget_amount*100):.1f}% of budget'
-            })
-            unread_count += 1
-        # Info if spending is over 50% of budget
-        elif monthly_spent > budget.budget_amount * 0.5:
-            alerts.append({
-                'type': 'info',
-                'message': f'Budget threshold warning for {budget.category}',
-                'details': f'Used {(monthly_spent/budget.budget_amount*100):.1f}% of budget'
-            })
-            unread_count += 1
+    unread_count, unread = unread_notifications(current_user.id)
+    if not unread_count and ensure_notifications(current_user.id):
+        db.session.commit()
+        unread_count, unread = unread_notifications(current_user.id)
     
     return jsonify({
         'unread': unread_count,
-        'alerts': alerts
+        'alerts': [notification.to_dict() for notification in unread]
     })
 
 @auth_bp.route('/api/mark-notifications-read', methods=['POST'])
@@ -679,6 +680,13 @@ def get_notifications():
 @limiter.limit("60 per minute")  # Rate limiting for API endpoints
 def mark_notifications_read():
     """Mark all notifications as read"""
+    try:
+        mark_read(current_user.id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error marking notifications read: {str(e)}")
+        return jsonify({'status': 'error'}), 500
     return jsonify({'status': 'success'})
 
 @auth_bp.route('/api/refresh-csrf', methods=['GET'])
@@ -690,17 +698,16 @@ def refresh_csrf():
         audit_log = AuditLog(
             user_id=current_user.id,
             action='CSRF_TOKEN_REFRESH',
-            endpoint='auth.refresh_csrf',
             ip_address=request.remote_addr,
             timestamp=datetime.utcnow(),
             details=json.dumps({
+                'endpoint': 'auth.refresh_csrf',
                 'username': current_user.username
             }),
             resource_type='csrf',
             resource_id=None
         )
-        db.session.add(audit_log)
-        db.session.commit()
+        audit_sink.enqueue(audit_log)
         
         return jsonify({'csrf_token': generate_csrf()})
     except Exception as e:
@@ -708,18 +715,17 @@ def refresh_csrf():
         error_log = AuditLog(
             user_id=current_user.id,
             action='CSRF_TOKEN_REFRESH_ERROR',
-            endpoint='auth.refresh_csrf',
             ip_address=request.remote_addr,
             timestamp=datetime.utcnow(),
             details=json.dumps({
+                'endpoint': 'auth.refresh_csrf',
                 'error': str(e),
                 'username': current_user.username
             }),
             resource_type='csrf',
             resource_id=None
         )
-        db.session.add(error_log)
-        db.session.commit()
+        audit_sink.enqueue(error_log)
         
         return jsonify({'error': 'Failed to refresh CSRF token'}), 500
 
@@ -742,8 +748,7 @@ def user_list():
             }),
             ip_address=request.remote_addr
         )
-        db.session.add(audit_log)
-        db.session.commit()
+        audit_sink.enqueue(audit_log)
         
         return render_template('admin/users.html', users=users)
     except Exception as e:
@@ -759,8 +764,7 @@ def user_list():
             }),
             ip_address=request.remote_addr
         )
-        db.session.add(error_log)
-        db.session.commit()
+        audit_sink.enqueue(error_log)
         
         flash('Error loading user list.', 'error')
         return redirect(url_for('auth.dashboard'))
@@ -797,10 +801,10 @@ def edit_user(user_id):
             audit_log = AuditLog(
                 user_id=current_user.id,
                 action='USER_UPDATED',
-                endpoint='auth.edit_user',
                 ip_address=request.remote_addr,
                 timestamp=datetime.utcnow(),
                 details=json.dumps({
+                    'endpoint': 'auth.edit_user',
                     'updated_user_id': user_id,
                     'updated_username': user.username,
                     'updated_role': user.role,
@@ -810,8 +814,10 @@ def edit_user(user_id):
                 resource_type='users',
                 resource_id=str(user_id)
             )
-            db.session.add(audit_log)
+            audit_sink.enqueue_on_commit(audit_log)
+            bump_user_version()
             db.session.commit()
+            invalidate_user(user_id)
             
             flash('User updated successfully!', 'success')
             return redirect(url_for('auth.user_list'))
@@ -829,10 +835,10 @@ def edit_user(user_id):
         error_log = AuditLog(
             user_id=current_user.id,
             action='USER_UPDATE_ERROR',
-            endpoint='auth.edit_user',
             ip_address=request.remote_addr,
             timestamp=datetime.utcnow(),
             details=json.dumps({
+                'endpoint': 'auth.edit_user',
                 'error': str(e),
                 'attempted_user_id': user_id,
                 'updated_by': current_user.username
@@ -840,8 +846,7 @@ def edit_user(user_id):
             resource_type='users',
             resource_id=str(user_id)
         )
-        db.session.add(error_log)
-        db.session.commit()
+        audit_sink.enqueue(error_log)
         
         flash('Error updating user. Please try again.', 'error')
         return redirect(url_for('auth.user_list'))
@@ -873,18 +878,20 @@ def delete_user(user_id):
         audit_log = AuditLog(
             user_id=current_user.id,
             action='USER_DELETED',
-            endpoint='auth.delete_user',
             ip_address=request.remote_addr,
             timestamp=datetime.utcnow(),
             details=json.dumps({
+                'endpoint': 'auth.delete_user',
                 'deleted_user_details': user_details,
                 'deleted_by': current_user.username
             }),
             resource_type='users',
             resource_id=str(user_id)
         )
-        db.session.add(audit_log)
+        audit_sink.enqueue_on_commit(audit_log)
+        bump_user_version()
         db.session.commit()
+        invalidate_user(user_id)
         
         flash('User deleted successfully!', 'success')
         return redirect(url_for('auth.user_list'))
@@ -895,10 +902,10 @@ def delete_user(user_id):
         error_log = AuditLog(
             user_id=current_user.id,
             action='USER_DELETION_ERROR',
-            endpoint='auth.delete_user',
             ip_address=request.remote_addr,
             timestamp=datetime.utcnow(),
             details=json.dumps({
+                'endpoint': 'auth.delete_user',
                 'error': str(e),
                 'attempted_user_id': user_id,
                 'deleted_by': current_user.username
@@ -906,8 +913,7 @@ def delete_user(user_id):
             resource_type='users',
             resource_id=str(user_id)
         )
-        db.session.add(error_log)
-        db.session.commit()
+        audit_sink.enqueue(error_log)
         
         flash('Error deleting user. Please try again.', 'error')
         return redirect(url_for('auth.user_list'))
@@ -941,7 +947,7 @@ def add_user():
                 }),
                 ip_address=request.remote_addr
             )
-            db.session.add(audit_log)
+            audit_sink.enqueue_on_commit(audit_log)
             db.session.commit()
             
             flash('User added successfully.', 'success')
@@ -961,8 +967,7 @@ def add_user():
             }),
             ip_address=request.remote_addr
         )
-        db.session.add(error_log)
-        db.session.commit()
+        audit_sink.enqueue(error_log)
         
         flash('Error adding user.', 'error')
         return redirect(url_for('auth.admin_user_management'))
@@ -997,8 +1002,10 @@ def admin_edit_user(user_id):
                 }),
                 ip_address=request.remote_addr
             )
-            db.session.add(audit_log)
+            audit_sink.enqueue_on_commit(audit_log)
+            bump_user_version()
             db.session.commit()
+            invalidate_user(user_id)
             
             flash('User updated successfully.', 'success')
             return redirect(url_for('auth.admin_user_management'))
@@ -1017,8 +1024,7 @@ def admin_edit_user(user_id):
             }),
             ip_address=request.remote_addr
         )
-        db.session.add(error_log)
-        db.session.commit()
+        audit_sink.enqueue(error_log)
         
         flash('Error updating user.', 'error')
         return redirect(url_for('auth.admin_user_management'))
@@ -1049,8 +1055,10 @@ def admin_delete_user(user_id):
         )
         
         db.session.delete(user)
-        db.session.add(audit_log)
+        audit_sink.enqueue_on_commit(audit_log)
+        bump_user_version()
         db.session.commit()
+        invalidate_user(user_id)
         
         flash('User deleted successfully.', 'success')
         return redirect(url_for('auth.admin_user_management'))
@@ -1067,8 +1075,7 @@ def admin_delete_user(user_id):
             }),
             ip_address=request.remote_addr
         )
-        db.session.add(error_log)
-        db.session.commit()
+        audit_sink.enqueue(error_log)
         
         flash('Error deleting user.', 'error')
         return redirect(url_for('auth.admin_user_management'))
@@ -1106,6 +1113,36 @@ def settings():
 def admin():
     return render_template('admin/dashboard.html')
 
+@auth_bp.route('/api/admin/cache-stats')
+@login_required
+@admin_required
+def cache_stats():
+    """Hit/miss counters for the in-process caches, for sizing them"""
+    return jsonify({
+        'user_cache': user_cache.stats(),
+        'count_cache': count_cache.stats()
+    })
+
+@auth_bp.route('/api/admin/pool-stats')
+@login_required
+@admin_required
+def db_pool_stats():
+    """Connection pool occupancy and churn for this worker process"""
+    return jsonify(pool_stats())
+
+@auth_bp.route('/admin/query-profile', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def query_profile():
+    """Per-endpoint SQL statement counts and timings since start-up or the last reset"""
+    if request.method == 'POST':
+        query_profiler.reset()
+        flash('Query profile reset.', 'success')
+        return redirect(url_for('auth.query_profile'))
+    return render_template('admin/query_profile.html',
+                         endpoints=query_profiler.stats(),
+                         repeat_threshold=query_profiler.repeat_threshold)
+
 @auth_bp.route('/departments')
 @login_required
 def department_list():
@@ -1115,7 +1152,8 @@ def department_list():
         return redirect(url_for('auth.dashboard'))
     
     departments = Department.query.all()
-    return render_template('department/list.html', departments=departments)
+    monthly_totals = Department.monthly_totals(d.id for d in departments)
+    return render_template('department/list.html', departments=departments, monthly_totals=monthly_totals)
 
 @auth_bp.route('/department/<int:dept_id>/employees')
 @login_required
@@ -1134,11 +1172,9 @@ def department_employees(dept_id):
     
     employees = User.query.filter_by(department_id=dept_id).all()
     
-    # Get latest payroll for each employee
-    employee_payroll = {}
-    for employee in employees:
-        latest_payroll = Payroll.query.filter_by(employee_id=employee.id).order_by(Payroll.date.desc()).first()
-        employee_payroll[employee.id] = latest_payroll
+    # Get latest payroll for each employee in one query
+    latest_payroll = Payroll.latest_for_employees(employee.id for employee in employees)
+    employee_payroll = {employee.id: latest_payroll.get(employee.id) for employee in employees}
 
     return render_template('department/employees.html', 
                          department=department, 
@@ -1177,12 +1213,13 @@ def api_departments():
 
     # GET method - return all departments
     departments = Department.query.all()
+    monthly_totals = Department.monthly_totals(d.id for d in departments)
     return jsonify([{
         'id': d.id,
         'name': d.name,
         'budget_limit': d.budget_limit,
         'manager_id': d.manager_id,
-        'monthly_expenses': d.monthly_expenses
+        'monthly_expenses': monthly_totals[d.id]['expense']
     } for d in departments])
 
 @auth_bp.route('/api/departments/<int:dept_id>', methods=['GET', 'PUT', 'DELETE'])
@@ -1200,7 +1237,7 @@ def api_department(dept_id):
             'name': department.name,
             'budget_limit': department.budget_limit,
             'manager_id': department.manager_id,
-            'monthly_expenses': department.monthly_expenses
+            'monthly_expenses': department.get_monthly_expenses()
         })
 
     elif request.method == 'PUT':
@@ -1306,28 +1343,18 @@ def manager_dashboard():
         
         # Get department statistics
         total_budget = department.budget_limit
-        pending_transactions = Transaction.query.filter_by(
-            department_id=department.id,
-            status='pending'
-        ).all()
+        pending_transactions = pending_transactions_query(department.id).all()
         
         # Calculate department expenses
         month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        monthly_expenses = db.session.query(func.sum(Transaction.amount)).filter(
-            Transaction.department_id == department.id,
-            Transaction.type == 'expense',
-            Transaction.status == 'approved',
-            Transaction.date >= month_start
-        ).scalar() or 0
+        monthly_expenses = department_expenses_query(department.id, month_start).scalar() or 0
         
         # Get department employees
         employees = User.query.filter_by(department_id=department.id).all()
         
-        # Get upcoming payroll
-        upcoming_payroll = Payroll.query.filter(
-            Payroll.employee_id.in_([emp.id for emp in employees]),
-            Payroll.status == 'pending'
-        ).all()
+        # Get upcoming payroll: every pending record, not just each employee's latest,
+        # so an older unpaid run stays visible
+        upcoming_payroll = pending_payroll_query(emp.id for emp in employees).all()
         
         return render_template('manager/dashboard.html',
                              department=department,
@@ -1349,7 +1376,7 @@ def department_transactions(dept_id):
         return redirect(url_for('auth.dashboard'))
     
     department = Department.query.get_or_404(dept_id)
-    transactions = Transaction.query.filter_by(department_id=dept_id).order_by(Transaction.date.desc()).all()
+    transactions = department_transactions_query(dept_id).all()
     
     return render_template('department/transactions.html',
                          department=department,
@@ -1369,15 +1396,65 @@ def approve_transaction(transaction_id):
     if action not in ['approve', 'reject']:
         return jsonify({'error': 'Invalid action'}), 400
     
+    previous_entry = ledger_entry(transaction)
     transaction.status = 'approved' if action == 'approve' else 'rejected'
     transaction.approver_id = current_user.id
     transaction.approval_date = datetime.utcnow()
+    move_transaction(previous_entry, transaction)
+    refresh_budget_notifications()
+    bump_ledger_version()
     
     db.session.commit()
+    publish_transaction(f'transaction.{transaction.status}', transaction)
+    
+    return jsonify({
+        'status': 'success',
+        'message': f'Transaction {transaction.status} successfully'
+    })
+
+@auth_bp.route('/manager/approve-transactions', methods=['POST'])
+@login_required
+@manager_required
+def bulk_approve_transactions():
+    """Approve or reject a list of transactions, or every pending one matching a filter"""
+    data = request.get_json(silent=True) or {}
+    action = data.get('action')
+    if action not in BULK_ACTIONS:
+        return jsonify({'error': 'Invalid action'}), 400
+    
+    ids = data.get('ids')
+    filters = None
+    try:
+        if ids is not None:
+            ids = list(dict.fromkeys(int(id) for id in ids))
+            if not ids or len(ids) > BULK_APPROVAL_MAX:
+                return jsonify({'error': f'Provide between 1 and {BULK_APPROVAL_MAX} ids'}), 400
+        else:
+            filters = dict(data.get('filter') or {})
+            for name in ('start_date', 'end_date'):
+                if filters.get(name):
+                    filters[name] = datetime.strptime(filters[name], '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid ids or filter'}), 400
+    
+    try:
+        outcomes, updated = bulk_review(current_user, action, ids=ids, filters=filters,
+                                        source_ip=request.remote_addr)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Bulk {action} failed: {str(e)}")
+        return jsonify({'error': f'Bulk {action} failed'}), 500
+    
+    status = BULK_ACTIONS[action]
+    for row in updated:
+        event_data = dict(transaction_event_data(row), status=status)
+        hub.publish(f'transaction.{status}', event_data, department_id=event_data['department_id'])
     
     return jsonify({
         'status': 'success',
-        'message': f'Transaction {action}d successfully'
+        'updated': len(updated),
+        'results': [{'id': id, 'outcome': outcome} for id, outcome in outcomes.items()]
     })
 
 @auth_bp.route('/department/<int:dept_id>/budget')
@@ -1390,26 +1467,10 @@ def department_budget(dept_id):
     
     department = Department.query.get_or_404(dept_id)
     
-    # Get monthly expenses
-    now = datetime.utcnow()
-    month_start = now.replace(day=1, hour=0, minute=0, second=0)
-    monthly_expenses = db.session.query(func.sum(Transaction.amount)).filter(
-        Transaction.department_id == dept_id,
-        Transaction.type == 'expense',
-        Transaction.status == 'approved',
-        Transaction.date >= month_start
-    ).scalar() or 0
-    
-    # Get expenses by category
-    expenses_by_category = db.session.query(
-        Transaction.category,
-        func.sum(Transaction.amount).label('total')
-    ).filter(
-        Transaction.department_id == dept_id,
-        Transaction.type == 'expense',
-        Transaction.status == 'approved',
-        Transaction.date >= month_start
-    ).group_by(Transaction.category).all()
+    # Get this month's approved expenses, total and by category
+    current_month = month_start()
+    monthly_expenses = type_totals(current_month, department_id=dept_id, status='approved')['expense']
+    expenses_by_category = list(category_totals(current_month, department_id=dept_id, status='approved').items())
     
     return render_template('department/budget.html',
                          department=department,
@@ -1494,8 +1555,7 @@ def admin_user_management():
             }),
             ip_address=request.remote_addr
         )
-        db.session.add(audit_log)
-        db.session.commit()
+        audit_sink.enqueue(audit_log)
         
         return render_template('admin/user_management.html', users=users)
     except Exception as e:
@@ -1511,8 +1571,7 @@ def admin_user_management():
             }),
             ip_address=request.remote_addr
         )
-        db.session.add(error_log)
-        db.session.commit()
+        audit_sink.enqueue(error_log)
         
         flash('Error accessing user management.', 'error')
         return redirect(url_for('main.dashboard'))
@@ -1525,31 +1584,36 @@ def edit_transaction(id):
     transaction = Transaction.query.get_or_404(id)
     if request.method == 'POST':
         try:
+            previous_entry = ledger_entry(transaction)
             transaction.type = request.form['type']
             transaction.amount = float(request.form['amount'])
             transaction.description = request.form['description']
             transaction.category = request.form['category']
             transaction.department_id = request.form['department_id']
             transaction.date = datetime.strptime(request.form['date'], '%Y-%m-%d') if request.form['date'] else None
+            move_transaction(previous_entry, transaction)
+            refresh_budget_notifications()
+            bump_ledger_version()
             
             # Add audit log
             audit_log = AuditLog(
                 user_id=current_user.id,
                 action='UPDATE',
-                endpoint='main.edit_transaction',
                 ip_address=request.remote_addr,
                 timestamp=datetime.utcnow(),
                 details=json.dumps({
+                    'endpoint': 'main.edit_transaction',
                     'type': transaction.type,
-                    'amount': transaction.amount,
+                    'amount': float(transaction.amount),
                     'category': transaction.category
                 }),
                 resource_type='transaction',
                 resource_id=str(transaction.id)
             )
-            db.session.add(audit_log)
+            audit_sink.enqueue_on_commit(audit_log)
             
             db.session.commit()
+            publish_transaction('transaction.updated', transaction)
             flash('Transaction updated successfully.', 'success')
             return redirect(url_for('main.view_transactions'))
         except Exception as e:
@@ -1580,22 +1644,27 @@ def delete_transaction(id):
         audit_log = AuditLog(
             user_id=current_user.id,
             action='DELETE',
-            endpoint='main.delete_transaction',
             ip_address=request.remote_addr,
             timestamp=datetime.utcnow(),
             details=json.dumps({
+                'endpoint': 'main.delete_transaction',
                 'type': transaction.type,
-                'amount': transaction.amount,
+                'amount': float(transaction.amount),
                 'category': transaction.category,
                 'department_id': transaction.department_id
             }),
             resource_type='transaction',
             resource_id=str(transaction.id)
         )
-        db.session.add(audit_log)
+        audit_sink.enqueue_on_commit(audit_log)
         
+        event_data = transaction_event_data(transaction)
+        record_transaction(transaction, sign=-1)
         db.session.delete(transaction)
+        refresh_budget_notifications()
+        bump_ledger_version()
         db.session.commit()
+        hub.publish('transaction.deleted', event_data, department_id=event_data['department_id'])
         return jsonify({'message': 'Transaction deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
@@ -1606,18 +1675,22 @@ def delete_transaction(id):
 @login_required
 @finance_required
 def get_budgets():
-    """View all budgets with their utilization"""
-    budgets = Budget.query.all()
-    budget_data = []
+    """View all budgets with their utilization for the selected period"""
+    period = request.args.get('period', 'month')
+    if period not in BUDGET_PERIODS:
+        period = 'month'
+    period_start, period_end = period_bounds(
+        period, fiscal_year_start_month=current_app.config.get('FISCAL_YEAR_START_MONTH', 1)
+    )
     
-    for budget in budgets:
-        # Calculate total expenses for this budget category
-        total_expenses = sum(t.amount for t in budget.transactions 
-                           if t.type == 'expense' and t.status == 'approved')
+    # Approved spend per category for the period, in one grouped query
+    budget_data = []
+    for budget in budget_spend(period_start, period_end, status='approved'):
+        total_expenses = budget['spent']
         
         # Calculate percentage utilized
-        if budget.budget_amount > 0:
-            utilization = (total_expenses / budget.budget_amount) * 100
+        if budget['budget_amount'] > 0:
+            utilization = float(total_expenses / budget['budget_amount'] * 100)
         else:
             utilization = 0
         
@@ -1630,14 +1703,20 @@ def get_budgets():
             status = 'good'
         
         budget_data.append({
-            'category': budget.category,
-            'budget_amount': budget.budget_amount,
+            'category': budget['category'],
+            'budget_amount': budget['budget_amount'],
             'total_expenses': total_expenses,
+            'remaining': budget['budget_amount'] - total_expenses,
             'utilization': utilization,
             'status': status
         })
     
-    return render_template('budgets.html', budgets=budget_data)
+    return render_template('budgets.html',
+                         budgets=budget_data,
+                         period=period,
+                         periods=BUDGET_PERIODS,
+                         period_start=period_start,
+                         period_last_day=period_end - timedelta(days=1))
 
 @main_bp.route('/budget/add', methods=['GET', 'POST'])
 @login_required
@@ -1662,19 +1741,21 @@ def add_budget():
             audit_log = AuditLog(
                 user_id=current_user.id,
                 action='CREATE',
-                endpoint='main.add_budget',
                 ip_address=request.remote_addr,
                 timestamp=datetime.utcnow(),
                 details=json.dumps({
+                    'endpoint': 'main.add_budget',
                     'category': category,
                     'budget_amount': budget_amount
                 }),
                 resource_type='budget',
                 resource_id=category
             )
-            db.session.add(audit_log)
+            audit_sink.enqueue_on_commit(audit_log)
             
+            bump_ledger_version()
             db.session.commit()
+            hub.publish('budget.created', {'category': category, 'budget_amount': budget_amount})
             flash('Budget category added successfully.', 'success')
             return redirect(url_for('main.get_budgets'))
         except Exception as e:
@@ -1692,24 +1773,27 @@ def edit_budget(category):
     if request.method == 'POST':
         try:
             budget.budget_amount = float(request.form['budget_amount'])
+            refresh_budget_notifications()
+            bump_ledger_version()
             
             # Add audit log
             audit_log = AuditLog(
                 user_id=current_user.id,
                 action='UPDATE',
-                endpoint='main.edit_budget',
                 ip_address=request.remote_addr,
                 timestamp=datetime.utcnow(),
                 details=json.dumps({
+                    'endpoint': 'main.edit_budget',
                     'category': category,
-                    'budget_amount': budget.budget_amount
+                    'budget_amount': float(budget.budget_amount)
                 }),
                 resource_type='budget',
                 resource_id=category
             )
-            db.session.add(audit_log)
+            audit_sink.enqueue_on_commit(audit_log)
             
             db.session.commit()
+            hub.publish('budget.updated', {'category': category, 'budget_amount': budget.budget_amount})
             flash('Budget updated successfully.', 'success')
             return redirect(url_for('main.get_budgets'))
         except Exception as e:
@@ -1736,20 +1820,22 @@ def delete_budget(category):
         audit_log = AuditLog(
             user_id=current_user.id,
             action='DELETE',
-            endpoint='main.delete_budget',
             ip_address=request.remote_addr,
             timestamp=datetime.utcnow(),
             details=json.dumps({
+                'endpoint': 'main.delete_budget',
                 'category': category,
-                'budget_amount': budget.budget_amount
+                'budget_amount': float(budget.budget_amount)
             }),
             resource_type='budget',
             resource_id=category
         )
-        db.session.add(audit_log)
+        audit_sink.enqueue_on_commit(audit_log)
         
         db.session.delete(budget)
+        bump_ledger_version()
         db.session.commit()
+        hub.publish('budget.deleted', {'category': category})
         flash('Budget category deleted successfully.', 'success')
     except Exception as e:
         db.session.rollback()
@@ -1762,40 +1848,31 @@ def delete_budget(category):
 @finance_required
 def get_payroll_overview():
     """View payroll overview and history"""
-    current_month = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    
-    # Get current month's payroll data
-    current_payroll = Payroll.query.filter(
-        Payroll.payment_date >= current_month,
-        Payroll.payment_date < current_month.replace(month=current_month.month + 1)
-    ).all()
-    
-    # Calculate total payroll for current month
-    total_current = sum(p.salary_amount for p in current_payroll)
-    
-    # Get historical data for the past 6 months
-    historical_data = []
-    for i in range(6):
-        month = current_month.replace(month=current_month.month - i)
-        if month.month > current_month.month:
-            month = month.replace(year=month.year - 1)
-        
-        month_payroll = Payroll.query.filter(
-            Payroll.payment_date >= month,
-            Payroll.payment_date < month.replace(month=month.month + 1)
-        ).all()
-        
-        total = sum(p.salary_amount for p in month_payroll)
-        historical_data.append({
-            'month': month.strftime('%B %Y'),
-            'total': total,
-            'count': len(month_payroll)
-        })
+    months = request.args.get('months', PAYROLL_HISTORY_MONTHS[0], type=int)
+    if months not in PAYROLL_HISTORY_MONTHS:
+        months = PAYROLL_HISTORY_MONTHS[0]
+    
+    current_month = month_start(datetime.utcnow())
+    
+    # Get current month's payroll records
+    current_payroll = payroll_month_query(current_month).all()
+    
+    # Totals and counts for the trailing months, newest first, in one grouped query
+    history = payroll_history(months, current_month)
+    total_current = history[0]['total']
+    
+    historical_data = [{
+        'month': entry['month_start'].strftime('%B %Y'),
+        'total': entry['total'],
+        'count': entry['count']
+    } for entry in history]
     
     return render_template('payroll.html',
                          current_payroll=current_payroll,
                          total_current=total_current,
-                         historical_data=historical_data)
+                         historical_data=historical_data,
+                         months=months,
+                         history_options=PAYROLL_HISTORY_MONTHS)
 
 @main_bp.route('/payroll/add', methods=['GET', 'POST'])
 @login_required
@@ -1815,13 +1892,7 @@ def add_payroll():
                 return redirect(url_for('main.get_payroll_overview'))
             
             # Check if payroll record already exists for this month
-            existing_payroll = Payroll.query.filter(
-                Payroll.employee_id == employee_id,
-                Payroll.payment_date.between(
-                    payment_date.replace(day=1),
-                    payment_date.replace(day=1, month=payment_date.month + 1)
-                )
-            ).first()
+            existing_payroll = employee_payroll_month_query(employee_id, payment_date).first()
             
             if existing_payroll:
                 flash('Payroll record already exists for this month.', 'error')
@@ -1838,10 +1909,10 @@ def add_payroll():
             audit_log = AuditLog(
                 user_id=current_user.id,
                 action='CREATE',
-                endpoint='main.add_payroll',
                 ip_address=request.remote_addr,
                 timestamp=datetime.utcnow(),
                 details=json.dumps({
+                    'endpoint': 'main.add_payroll',
                     'employee_id': employee_id,
                     'salary_amount': salary_amount,
                     'payment_date': payment_date.strftime('%Y-%m-%d')
@@ -1849,9 +1920,15 @@ def add_payroll():
                 resource_type='payroll',
                 resource_id=None
             )
-            db.session.add(audit_log)
+            audit_sink.enqueue_on_commit(audit_log)
             
+            bump_ledger_version()
             db.session.commit()
+            hub.publish('payroll.created', {
+                'id': payroll.id,
+                'employee_id': payroll.employee_id,
+                'payment_date': payroll.payment_date.strftime('%Y-%m-%d')
+            }, roles=PAYROLL_EVENT_ROLES)
             flash('Payroll record added successfully.', 'success')
             return redirect(url_for('main.get_payroll_overview'))
         except Exception as e:
@@ -1876,20 +1953,26 @@ def edit_payroll(id):
             audit_log = AuditLog(
                 user_id=current_user.id,
                 action='UPDATE',
-                endpoint='main.edit_payroll',
                 ip_address=request.remote_addr,
                 timestamp=datetime.utcnow(),
                 details=json.dumps({
+                    'endpoint': 'main.edit_payroll',
                     'employee_id': payroll.employee_id,
-                    'salary_amount': payroll.salary_amount,
+                    'salary_amount': float(payroll.salary_amount),
                     'payment_date': payroll.payment_date.strftime('%Y-%m-%d')
                 }),
                 resource_type='payroll',
                 resource_id=str(payroll.id)
             )
-            db.session.add(audit_log)
+            audit_sink.enqueue_on_commit(audit_log)
             
+            bump_ledger_version()
             db.session.commit()
+            hub.publish('payroll.updated', {
+                'id': payroll.id,
+                'employee_id': payroll.employee_id,
+                'payment_date': payroll.payment_date.strftime('%Y-%m-%d')
+            }, roles=PAYROLL_EVENT_ROLES)
             flash('Payroll record updated successfully.', 'success')
             return redirect(url_for('main.get_payroll_overview'))
         except Exception as e:
@@ -1910,63 +1993,60 @@ def delete_payroll(id):
         audit_log = AuditLog(
             user_id=current_user.id,
             action='DELETE',
-            endpoint='main.delete_payroll',
             ip_address=request.remote_addr,
             timestamp=datetime.utcnow(),
             details=json.dumps({
+                'endpoint': 'main.delete_payroll',
                 'employee_id': payroll.employee_id,
-                'salary_amount': payroll.salary_amount,
+                'salary_amount': float(payroll.salary_amount),
                 'payment_date': payroll.payment_date.strftime('%Y-%m-%d')
             }),
             resource_type='payroll',
             resource_id=str(payroll.id)
         )
-        db.session.add(audit_log)
+        audit_sink.enqueue_on_commit(audit_log)
         
         db.session.delete(payroll)
+        bump_ledger_version()
         db.session.commit()
+        hub.publish('payroll.deleted', {'id': id}, roles=PAYROLL_EVENT_ROLES)
         flash('Payroll record deleted successfully.', 'success')
     except Exception as e:
         db.session.rollback()
         flash(f'Error deleting payroll record: {str(e)}', 'error')
     return redirect(url_for('main.get_payroll_overview'))
 
+TRANSACTION_FILTERS = ('start_date', 'end_date', 'type', 'category', 'status', 'department_id')
+TRANSACTIONS_PER_PAGE_MAX = 100
+
 @main_bp.route('/transactions')
 @login_required
 @finance_required
 def view_transactions():
     """View all transactions with filtering options"""
     # Get filter parameters
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-    transaction_type = request.args.get('type')
-    status = request.args.get('status')
-    department_id = request.args.get('department_id')
-    
-    # Base query
-    query = Transaction.query
-    
-    # Apply filters
-    if start_date:
-        query = query.filter(Transaction.date >= datetime.strptime(start_date, '%Y-%m-%d'))
-    if end_date:
-        query = query.filter(Transaction.date <= datetime.strptime(end_date, '%Y-%m-%d'))
-    if transaction_type:
-        query = query.filter(Transaction.type == transaction_type)
-    if status:
-        query = query.filter(Transaction.status == status)
-    if department_id:
-        query = query.filter(Transaction.department_id == int(department_id))
-    elif not current_user.role == 'admin':
-        # Non-admin users can only see their department's transactions
-        query = query.filter(Transaction.department_id == current_user.department_id)
-    
-    # Get results with pagination
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    transactions = query.order_by(Transaction.date.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    filters = {name: request.args.get(name) for name in TRANSACTION_FILTERS}
+    try:
+        query = filtered_transactions(filters, current_user)
+    except ValueError:
+        abort(400)
+    
+    # Seek on (date, id) instead of OFFSET; cursors are opaque tokens
+    per_page = min(max(request.args.get('per_page', 10, type=int), 1), TRANSACTIONS_PER_PAGE_MAX)
+    try:
+        transactions = keyset_page(
+            query, Transaction.date, Transaction.id, per_page,
+            after=request.args.get('after'),
+            before=request.args.get('before')
+        )
+    except InvalidCursor:
+        abort(400)
+    
+    # Approximate total, only when asked for and cached per filter set
+    if request.args.get('count'):
+        scope = filters['department_id'] or ('all' if current_user.role == 'admin' else current_user.department_id)
+        cache_key = ('transactions',) + tuple(filters[name] for name in TRANSACTION_FILTERS) + (scope,)
+        transactions.total = approximate_count(query, cache_key, filtered=any(filters.values()) or scope != 'all')
     
     # Get departments for filtering
     departments = Department.query.all() if current_user.role == 'admin' else [current_user.department]
@@ -1978,13 +2058,127 @@ def view_transactions():
                          transactions=transactions,
                          departments=departments,
                          categories=categories,
-                         filters={
-                             'start_date': start_date,
-                             'end_date': end_date,
-                             'type': transaction_type,
-                             'status': status,
-                             'department_id': department_id
-                         })
+                         per_page=per_page,
+                         filters=filters)
+
+def requested_export_format():
+    """The ?format= of an export request; 400 when unsupported here"""
+    export_format = request.args.get('format', 'csv')
+    if export_format not in available_formats():
+        abort(400)
+    return export_format
+
+def parse_date_arg(name):
+    value = request.args.get(name)
+    return datetime.strptime(value, '%Y-%m-%d') if value else None
+
+@main_bp.route('/api/transactions/export')
+@login_required
+@finance_required
+@limiter.limit("10 per minute")
+def export_transactions():
+    """Stream transactions matching the listing filters as CSV or XLSX"""
+    export_format = requested_export_format()
+    filters = {name: request.args.get(name) for name in TRANSACTION_FILTERS}
+    try:
+        query = transaction_export_query(filters, current_user)
+    except ValueError:
+        abort(400)
+    return export_response(f'transactions_{datetime.utcnow():%Y-%m-%d}', TRANSACTION_EXPORT_COLUMNS,
+                           stream_query(query), export_format)
+
+@main_bp.route('/api/budgets/export')
+@login_required
+@finance_required
+@limiter.limit("10 per minute")
+def export_budgets():
+    """Stream budget categories as CSV or XLSX"""
+    export_format = requested_export_format()
+    query = Budget.query.order_by(Budget.category)
+    return export_response(f'budgets_{datetime.utcnow():%Y-%m-%d}', BUDGET_EXPORT_COLUMNS,
+                           stream_query(query), export_format)
+
+@main_bp.route('/api/payroll/export')
+@login_required
+@finance_required
+@limiter.limit("10 per minute")
+def export_payroll():
+    """Stream payroll records, optionally limited to a payment date range"""
+    export_format = requested_export_format()
+    try:
+        start_date, end_date = parse_date_arg('start_date'), parse_date_arg('end_date')
+    except ValueError:
+        abort(400)
+    query = payroll_export_query(start_date, end_date)
+    return export_response(f'payroll_{datetime.utcnow():%Y-%m-%d}', PAYROLL_EXPORT_COLUMNS,
+                           stream_query(query), export_format)
+
+@main_bp.route('/api/admin/logs/export')
+@login_required
+@admin_required
+@limiter.limit("10 per minute")
+def export_audit_logs():
+    """Stream audit logs, optionally filtered by date range, action and resource type"""
+    export_format = requested_export_format()
+    try:
+        start_date, end_date = parse_date_arg('start_date'), parse_date_arg('end_date')
+    except ValueError:
+        abort(400)
+    query = audit_log_export_query(start_date, end_date, request.args.get('action'),
+                                   request.args.get('resource_type'))
+    return export_response(f'system_logs_{datetime.utcnow():%Y-%m-%d}', AUDIT_LOG_EXPORT_COLUMNS,
+                           stream_query(query), export_format)
+
+@main_bp.route('/api/transactions/import', methods=['POST'])
+@login_required
+@finance_required
+@limiter.limit("5 per minute")
+def import_transactions_file():
+    """Bulk import transactions from an uploaded CSV or OFX file"""
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify({'error': 'No file uploaded'}), 400
+    
+    import_format = request.form.get('format') or upload.filename.rsplit('.', 1)[-1].lower()
+    if import_format not in IMPORT_FORMATS:
+        return jsonify({'error': f'Unsupported import format: {import_format}'}), 400
+    
+    stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+    rows = read_csv(stream) if import_format == 'csv' else read_ofx(stream)
+    
+    # Non-admin users can only import into their own department
+    department_ids = None if current_user.role == 'admin' else [current_user.department_id]
+    try:
+        result = import_transactions(
+            rows,
+            creator_id=current_user.id,
+            department_ids=department_ids,
+            defaults={
+                'category': request.form.get('category'),
+                'department_id': request.form.get('department_id') or current_user.department_id
+            },
+            source=upload.filename,
+            batch_size=current_app.config.get('IMPORT_BATCH_SIZE', 1000),
+            dry_run=request.form.get('dry_run') == '1'
+        )
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Transaction import failed: {str(e)}")
+        return jsonify({'error': 'Import failed'}), 500
+    
+    if result.batches:
+        hub.publish('transactions.imported', {'count': result.inserted})
+    if result.failure is not None:
+        # Earlier batches stay committed; the body says where to resume
+        row, message = result.failure
+        stopped = f'Import stopped at row {row}' if row is not None else 'Import stopped before the first row'
+        current_app.logger.error(f"Transaction import from {upload.filename}: {stopped}: {message}")
+        data = dict(result.to_dict(), error=stopped)
+        if message == 'file is not UTF-8 encoded':
+            return jsonify(data), 400
+        data['failure']['error'] = 'Could not save this batch'
+        return jsonify(data), 500
+    return jsonify(result.to_dict()), 200
 
 @main_bp.route('/transaction/<int:id>')
 @login_required
@@ -1997,10 +2191,7 @@ def view_transaction(id):
         abort(403)
     
     # Get audit logs for this transaction
-    audit_logs = AuditLog.query.filter_by(
-        resource_type='transaction',
-        resource_id=str(transaction.id)
-    ).order_by(AuditLog.created_at.desc()).all()
+    audit_logs = transaction_audit_query(transaction.id).all()
     
     return render_template('transaction_detail.html',
                          transaction=transaction,
@@ -2033,22 +2224,26 @@ def add_transaction():
             audit_log = AuditLog(
                 user_id=current_user.id,
                 action='CREATE',
-                endpoint='main.add_transaction',
                 ip_address=request.remote_addr,
                 timestamp=datetime.utcnow(),
                 details=json.dumps({
+                    'endpoint': 'main.add_transaction',
                     'type': transaction.type,
-                    'amount': transaction.amount,
+                    'amount': float(transaction.amount),
                     'category': transaction.category,
                     'department_id': transaction.department_id
                 }),
                 resource_type='transaction',
                 resource_id=None
             )
-            db.session.add(audit_log)
+            audit_sink.enqueue_on_commit(audit_log)
             
             db.session.add(transaction)
+            record_transaction(transaction)
+            refresh_budget_notifications()
+            bump_ledger_version()
             db.session.commit()
+            publish_transaction('transaction.created', transaction)
             flash('Transaction added successfully.', 'success')
             return redirect(url_for('main.view_transactions'))
         except Exception as e:
@@ -2068,49 +2263,14 @@ def add_transaction():
 @login_required
 def notifications():
     """View all notifications"""
-    # Get all notifications for the current user
-    notifications = []
-    
-    # Get all transactions from the last 30 days
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    transactions = Transaction.query.filter(Transaction.date >= thirty_days_ago).all()
-    
-    # Get all budgets
-    budgets = Budget.query.all()
-    
-    # Calculate monthly spending for each budget category
-    budget_spending = {}
-    for transaction in transactions:
-        if transaction.type == 'expense':
-            if transaction.category not in budget_spending:
-                budget_spending[transaction.category] = 0
-            budget_spending[transaction.category] += transaction.amount
-    
-    # Check each budget category for alerts
-    for budget in budgets:
-        monthly_spent = budget_spending.get(budget.category, 0)
-        
-        # Alert if spending is over 80% of budget
-        if monthly_spent > budget.budget_amount * 0.8:
-            notifications.append({
-                'id': f'budget_{budget.id}_warning',
-                'type': 'warning',
-                'message': f'Budget alert for {budget.category}',
-                'details': f'Used {(monthly_spent/budget.budget_amount*100):.1f}% of budget',
-                'timestamp': datetime.utcnow()
-            })
-        # Info if spending is over 50% of budget
-        elif monthly_spent > budget.budget_amount * 0.5:
-            notifications.append({
-                'id': f'budget_{budget.id}_info',
-                'type': 'info',
-                'message': f'Budget threshold warning for {budget.category}',
-                'details': f'Used {(monthly_spent/budget.budget_amount*100):.1f}% of budget',
-                'timestamp': datetime.utcnow()
-            })
-    
-    # Sort notifications by timestamp
-    notifications.sort(key=lambda x: x['timestamp'], reverse=True)
+    # Get the current user's unread notifications, newest first
+    notifications = [{
+        'id': notification.id,
+        'type': notification.type,
+        'message': notification.message,
+        'details': notification.details,
+        'timestamp': notification.created_at
+    } for notification in unread_query(current_user.id).limit(100)]
     
     return render_template('notifications.html', notifications=notifications)
 
@@ -2119,9 +2279,15 @@ def notifications():
 def mark_notification_read(notification_id):
     """Mark a specific notification as read"""
     try:
-        # In a real application, you would update the notification status in the database
+        updated = mark_read(current_user.id, int(notification_id))
+        db.session.commit()
+        if not updated:
+            return jsonify({'success': False, 'error': 'Notification not found'}), 404
         return jsonify({'success': True})
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid notification id'}), 400
     except Exception as e:
+        db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @auth_bp.route('/api/notifications/mark-all-read', methods=['POST'])
@@ -2129,7 +2295,9 @@ def mark_notification_read(notification_id):
 def mark_all_notifications_read():
     """Mark all notifications as read"""
     try:
-        # In a real application, you would update all notifications status in the database
+        mark_read(current_user.id)
+        db.session.commit()
         return jsonify({'success': True})
     except Exception as e:
+        db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
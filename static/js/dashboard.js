@@ -2,7 +2,6 @@
 document.addEventListener('DOMContentLoaded', function() {
     initializeDashboard();
     setupEventListeners();
-    startPeriodicUpdates();
 });
 
 // Initialize Dashboard Components
@@ -216,15 +215,6 @@ function toggleMobileMenu() {
     sidebar.classList.toggle('show');
 }
 
-// Start Periodic Updates
-function startPeriodicUpdates() {
-    // Update dashboard data every 5 minutes
-    setInterval(updateDashboardData, 5 * 60 * 1000);
-    
-    // Update notifications every minute
-    setInterval(updateNotifications, 60 * 1000);
-}
-
 // Initialize Notifications
 function initializeNotifications() {
     if ('Notification' in window) {
@@ -291,6 +281,7 @@ class DashboardManager {
             cashFlow: null
         };
         this.eventSource = null;
+        this.reconnectDelay = 5000;
         this.init();
     }
 
@@ -521,19 +512,36 @@ class DashboardManager {
 
         this.eventSource = new EventSource('/auth/api/dashboard-stream');
         
+        this.eventSource.onopen = () => {
+            this.reconnectDelay = 5000;
+        };
+
         this.eventSource.onmessage = (event) => {
             try {
+                // The stream pushes month-to-date KPIs whenever ledger data changes
                 const data = JSON.parse(event.data);
-                this.updateDashboardDisplay(data);
+                if (data.kpis) {
+                    this.updateKPIs(data.kpis);
+                }
+                if (data.events && data.events.length) {
+                    updateNotifications();
+                }
             } catch (error) {
                 console.error('Error processing real-time update:', error);
             }
         };
 
+        // The server is at its stream limit; the browser reconnects after the retry delay it sent
+        this.eventSource.addEventListener('busy', () => this.initializeDashboard());
+
         this.eventSource.onerror = () => {
-            this.eventSource.close();
-            // Attempt to reconnect after 5 seconds
-            setTimeout(() => this.setupRealtimeUpdates(), 5000);
+            // A dropped stream is reopened by the browser using the server's retry delay.
+            // Only a failed request (e.g. after a redirect to login) closes it for good.
+            if (this.eventSource.readyState !== EventSource.CLOSED) {
+                return;
+            }
+            setTimeout(() => this.setupRealtimeUpdates(), this.reconnectDelay);
+            this.reconnectDelay = Math.min(this.reconnectDelay * 2, 5 * 60 * 1000);
         };
     }
 
@@ -0,0 +1,219 @@
+import csv
+import json
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from models import db, Transaction, Budget, Department
+from money import to_cents, from_cents
+from finance_aggregates import TRANSACTION_TYPES
+from ledger_rollup import apply_deltas
+from notification_store import refresh_budget_notifications
+from ledger_version import bump_ledger_version
+from audit_sink import audit_sink
+
+IMPORT_FORMATS = ('csv', 'ofx')
+IMPORT_BATCH_SIZE = 1000
+CSV_DATE_FORMATS = ('%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%d/%m/%Y')
+
+OFX_TRANSACTION = re.compile(r'<STMTTRN>(.*?)</STMTTRN>', re.DOTALL | re.IGNORECASE)
+OFX_FIELD = re.compile(r'<(\w+)>([^<\r\n]*)')
+
+
+class ImportResult:
+    """Outcome of an import: rows inserted, batches committed and per-row errors.
+
+    If the import stopped early, failure holds (row, message) for the first
+    row not committed (row is None if the input could not be read at all)
+    and committed_through the last input row that was, so a retry can
+    resume after it instead of importing those rows again.
+    """
+
+    def __init__(self):
+        self.inserted = 0
+        self.batches = 0
+        self.errors = []
+        self.failure = None
+        self.committed_through = None
+
+    def to_dict(self, max_errors=1000):
+        data = {
+            'inserted': self.inserted,
+            'batches': self.batches,
+            'error_count': len(self.errors),
+            'errors': [{'row': row, 'error': message} for row, message in self.errors[:max_errors]]
+        }
+        if self.failure is not None:
+            row, message = self.failure
+            data['failure'] = {'row': row, 'error': message}
+            data['committed_through_row'] = self.committed_through
+        return data
+
+
+def read_csv(stream):
+    """Yield (row number, fields) from a CSV file with a header row.
+
+    Expected columns are date, type, amount, category, department_id and
+    description; category and department_id may be left to the defaults.
+    """
+    for number, row in enumerate(csv.DictReader(stream), 2):
+        yield number, {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+
+
+def read_ofx(stream):
+    """Yield (transaction number, fields) from the STMTTRN blocks of an OFX statement.
+
+    Handles both SGML (OFX 1.x, unclosed tags) and XML (OFX 2.x) files. The
+    sign of TRNAMT gives the type; the payee name and memo become the
+    description. The stream is read on the first iteration, so a decode
+    error surfaces inside import_transactions like it does for CSV.
+    """
+    for number, block in enumerate(OFX_TRANSACTION.findall(stream.read()), 1):
+        fields = {tag.upper(): value.strip() for tag, value in OFX_FIELD.findall(block)}
+        amount = fields.get('TRNAMT', '')
+        description = ' - '.join(part for part in (fields.get('NAME'), fields.get('MEMO')) if part)
+        yield number, {
+            'date': fields.get('DTPOSTED', '')[:8],
+            'type': 'expense' if amount.startswith('-') else 'income',
+            'amount': amount.lstrip('+-'),
+            'description': description
+        }
+
+
+def _parse_date(value):
+    if re.fullmatch(r'\d{8}', value):
+        return datetime.strptime(value, '%Y%m%d')
+    for date_format in CSV_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+    raise ValueError(f'invalid date {value!r}')
+
+
+def validate_row(fields, categories, department_ids, defaults):
+    """Turn one input row into transactions column values, raising ValueError if invalid."""
+    date = _parse_date(fields.get('date', ''))
+
+    transaction_type = fields.get('type', '').lower()
+    if transaction_type not in TRANSACTION_TYPES:
+        raise ValueError(f'invalid type {fields.get("type")!r}')
+
+    try:
+        cents = to_cents(fields.get('amount', '').replace(',', ''))
+    except InvalidOperation:
+        raise ValueError(f'invalid amount {fields.get("amount")!r}')
+    if cents <= 0:
+        raise ValueError('amount must be positive')
+
+    category = fields.get('category') or defaults.get('category')
+    if category not in categories:
+        raise ValueError(f'unknown category {category!r}')
+
+    try:
+        department_id = int(fields.get('department_id') or defaults.get('department_id'))
+    except (TypeError, ValueError):
+        raise ValueError(f'invalid department_id {fields.get("department_id")!r}')
+    if department_id not in department_ids:
+        raise ValueError(f'department {department_id} is not available')
+
+    return {
+        'date': date,
+        'type': transaction_type,
+        'amount': from_cents(cents),
+        'category': category,
+        'description': (fields.get('description') or '')[:200],
+        'department_id': department_id,
+        'status': 'pending'
+    }
+
+
+def _insert_batch(values, first_row, last_row, creator_id, source):
+    """Bulk-insert one batch, update the rollup and queue one audit entry."""
+    deltas = {}
+    for row in values:
+        row['creator_id'] = creator_id
+        key = (row['date'].date(), row['department_id'], row['category'], row['type'], row['status'])
+        delta = deltas.setdefault(key, [0, 0])
+        delta[0] += to_cents(row['amount'])
+        delta[1] += 1
+
+    db.session.execute(Transaction.__table__.insert(), values)
+    apply_deltas(deltas)
+    bump_ledger_version()
+    audit_sink.enqueue_on_commit({
+        'user_id': creator_id,
+        'action': 'TRANSACTIONS_IMPORTED',
+        'resource_type': 'transaction',
+        'details': json.dumps({
+            'source': source,
+            'rows': len(values),
+            'first_row': first_row,
+            'last_row': last_row,
+            'total': float(from_cents(sum(delta[0] for delta in deltas.values())))
+        })
+    })
+    db.session.commit()
+
+
+def import_transactions(rows, creator_id, department_ids=None, defaults=None, source=None,
+                        batch_size=IMPORT_BATCH_SIZE, dry_run=False):
+    """Validate and insert (row number, fields) pairs in batches of batch_size.
+
+    Invalid rows are skipped and reported in the result; valid rows are
+    inserted with one executemany per batch, and each batch commits with
+    its rollup deltas and a single summarizing audit entry. department_ids
+    limits which departments may be imported into (default: all). With
+    dry_run nothing is written.
+
+    An error reading the input or writing a batch stops the import; the
+    uncommitted batch is rolled back and the partial result is returned
+    with its failure set, since earlier batches stay committed. Budget
+    notifications are then left for the retry that completes the import.
+    """
+    defaults = defaults or {}
+    categories = {category for category, in db.session.query(Budget.category)}
+    allowed = {department_id for department_id, in db.session.query(Department.id)}
+    if department_ids is not None:
+        allowed &= set(department_ids)
+
+    result = ImportResult()
+    batch, first_row = [], None
+
+    def flush(last_row):
+        if batch and not dry_run:
+            _insert_batch(batch, first_row, last_row, creator_id, source)
+            result.batches += 1
+            result.committed_through = last_row
+        result.inserted += len(batch)
+
+    number = last_row = None
+    try:
+        for number, fields in rows:
+            try:
+                batch.append(validate_row(fields, categories, allowed, defaults))
+            except ValueError as e:
+                result.errors.append((number, str(e)))
+                continue
+            first_row = number if first_row is None else first_row
+            last_row = number
+            if len(batch) >= batch_size:
+                flush(last_row)
+                batch, first_row = [], None
+        flush(last_row)
+    except Exception as e:
+        db.session.rollback()
+        message = 'file is not UTF-8 encoded' if isinstance(e, UnicodeDecodeError) else str(e)
+        # Report the first row that was not committed: the start of the
+        # rolled-back batch, or else the row after the last one read (None
+        # when the input failed before its first row)
+        if batch:
+            failed_row = first_row
+        else:
+            failed_row = number + 1 if number is not None else None
+        result.failure = (failed_row, message)
+        return result
+
+    if result.inserted and not dry_run:
+        refresh_budget_notifications()
+        db.session.commit()
+    return result
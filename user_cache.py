@@ -0,0 +1,64 @@
+from sqlalchemy.orm import make_transient_to_detached
+from models import db, User
+from cache import TTLCache
+from ledger_version import bump_version, current_version, USER_VERSION_ID
+
+# Per-process cache of users.* column values, keyed by user id
+user_cache = TTLCache(maxsize=1024, ttl=60)
+
+# Shared user version as last read by this process, re-read every few seconds
+version_cache = TTLCache(maxsize=1, ttl=5)
+_cached_version = None
+
+
+def init_user_cache(app):
+    user_cache.maxsize = app.config.get('USER_CACHE_SIZE', user_cache.maxsize)
+    user_cache.ttl = app.config.get('USER_CACHE_TTL', user_cache.ttl)
+    version_cache.ttl = app.config.get('USER_CACHE_VERSION_SECONDS', version_cache.ttl)
+    app.extensions['user_cache'] = user_cache
+
+
+def _sync_version():
+    # Another process edited a user: drop every snapshot taken before that
+    global _cached_version
+    version = version_cache.get_or_set(USER_VERSION_ID, lambda: current_version(USER_VERSION_ID))
+    if version != _cached_version:
+        user_cache.clear()
+        _cached_version = version
+
+
+def _snapshot(user):
+    return {column.key: getattr(user, column.key) for column in User.__table__.columns}
+
+
+def load_cached_user(user_id):
+    """Return the user for a session id, hitting the database only on a cache miss.
+
+    The cache holds plain column values rather than ORM instances, so no
+    instance is shared between requests. A hit rebuilds a detached User and
+    attaches it to the current session with merge(load=False), which issues
+    no SQL; relationships still lazy-load as usual. Edits made in other
+    processes are picked up once the shared user version is re-read, at
+    most USER_CACHE_VERSION_SECONDS later.
+    """
+    _sync_version()
+    snapshot = user_cache.get(user_id)
+    if snapshot is None:
+        user = User.query.get(user_id)
+        if user is not None:
+            user_cache.set(user_id, _snapshot(user))
+        return user
+
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+def bump_user_version():
+    """Tell every process to drop its cached users; call before committing a user edit."""
+    bump_version(USER_VERSION_ID)
+
+
+def invalidate_user(user_id):
+    """Drop a user from this process's cache after the edit or delete is committed."""
+    user_cache.delete(user_id)
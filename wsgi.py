@@ -184,7 +184,7 @@ if __name__ == "__main__":
         serve(app, 
               host='0.0.0.0',
               port=int(os.getenv('PORT', 8000)),
-              threads=int(os.getenv('WAITRESS_THREADS', 4)),
+              threads=app.config['WAITRESS_THREADS'],  # also sizes the DB pool
               url_scheme='https',
               ident='Company Finance Tracker')
     else: